@@ -8,18 +8,27 @@ if sys.platform.startswith("win"):
 else:
     adb_executable = "adb"
 
-ADB_PATH = Path(os.environ["ANDROID_HOME"]) / "platform-tools" / adb_executable
 
-if not ADB_PATH.exists():
-    raise FileNotFoundError(
-        f"ADB executable not found at {ADB_PATH}. Please set the ANDROID_HOME environment variable correctly."
-    )
+def get_adb_path() -> Path:
+    # Resolved lazily, so that the controller can also be used on hosts without
+    # an Android SDK (e.g. together with the "local" transport).
+    if "ANDROID_HOME" not in os.environ:
+        raise FileNotFoundError(
+            "ANDROID_HOME is not set. Please set the ANDROID_HOME environment variable correctly."
+        )
+
+    adb_path = Path(os.environ["ANDROID_HOME"]) / "platform-tools" / adb_executable
+    if not adb_path.exists():
+        raise FileNotFoundError(
+            f"ADB executable not found at {adb_path}. Please set the ANDROID_HOME environment variable correctly."
+        )
+    return adb_path
 
 
 def call_adb(command: list[str]) -> str:
     try:
         result = subprocess.run(
-            [ADB_PATH] + command,
+            [get_adb_path()] + command,
             check=True,
             capture_output=True,
             text=True,
@@ -2,10 +2,12 @@ import abc
 import asyncio
 import dataclasses
 import enum
+import functools
 import logging
+import os
 import random
 import struct
-from typing import override
+from typing import Any, override
 from uuid import uuid4
 
 from bumble.att import ATT_INSUFFICIENT_ENCRYPTION_ERROR, ATT_Error
@@ -22,82 +24,360 @@ from bumble.gatt import (
 )
 from bumble.host import Host
 from bumble.profiles.battery_service import BatteryService
-from bumble.transport import open_transport
 from bumble.transport.common import Transport
+from metrics import PeripheralMetrics
+from transport_helper import DEFAULT_TRANSPORT, open_peripheral_transport
+
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("BLE_EMULATOR_MAX_CONCURRENCY", "16"))
+DEFAULT_STOP_TIMEOUT = float(os.environ.get("BLE_EMULATOR_STOP_TIMEOUT", "5.0"))
+BATTERY_NOTIFY_INTERVAL = float(
+    os.environ.get("BLE_EMULATOR_BATTERY_NOTIFY_INTERVAL", "5.0")
+)
+# Number of stopped peripherals whose final metrics are kept
+MAX_STOPPED_METRICS = 1000
+
+
+class UnknownPeripheralError(KeyError):
+    def __str__(self) -> str:
+        return f"Unknown peripheral: {self.args[0]}"
 
 
 class BlePeripheralDatabase:
-    def __init__(self):
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        stop_timeout: float = DEFAULT_STOP_TIMEOUT,
+    ):
         self.db: dict[str, BlePeripheral] = {}
+        self.stop_timeout = stop_timeout
+        # Limits how many peripherals are started/stopped at the same time
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # Addresses handed out by allocate_address(), including the ones of
+        # peripherals that are still starting
+        self.allocated_addresses: set[str] = set()
+        # Labels, metrics and final status of stopped peripherals, so load
+        # results can still be correlated after the teardown
+        self.stopped_metrics: dict[str, dict] = {}
+        # Running stops, concurrent requests for the same peripheral share them
+        self.stopping: dict[str, asyncio.Future["PeripheralStatus"]] = {}
+
+    def allocate_address(self) -> str:
+        """
+        Return a random static device address that no other peripheral uses.
+        """
+        used = self.allocated_addresses | {p.address.upper() for p in self.db.values()}
+        while True:
+            # The two most significant bits of a static address have to be set
+            address_bytes = [
+                random.randint(0, 255) | (0xC0 if i == 0 else 0) for i in range(6)
+            ]
+            address = ":".join(f"{b:02X}" for b in address_bytes)
+            if address not in used:
+                self.allocated_addresses.add(address)
+                return address
 
     def add_peripheral(self, peripheral: "BlePeripheral") -> str:
         peripheral_id = str(uuid4())
         self.db[peripheral_id] = peripheral
         return peripheral_id
 
-    async def stop_peripheral(self, peripheral_id: str):
-        peripheral = self.db[peripheral_id]
-        assert peripheral.transport
-        assert peripheral.wait_task
+    async def start_peripheral(
+        self, peripheral: "BlePeripheral", namespace: str = ""
+    ) -> str:
+        peripheral.namespace = namespace
+        try:
+            async with self.semaphore:
+                await peripheral.start_peripheral()
+        except BaseException:
+            self.allocated_addresses.discard(peripheral.address.upper())
+            raise
+        return self.add_peripheral(peripheral)
+
+    async def start_peripherals(
+        self, peripherals: list["BlePeripheral"], namespace: str = ""
+    ) -> list[str]:
+        """
+        Start all peripherals concurrently.
 
-        peripheral.wait_task.cancel()
-        await peripheral.transport.close()
+        If one of them fails, the already started ones are stopped again and
+        the first error is raised.
+        """
+        results = await asyncio.gather(
+            *(
+                self.start_peripheral(peripheral, namespace)
+                for peripheral in peripherals
+            ),
+            return_exceptions=True,
+        )
+        peripheral_ids = [r for r in results if isinstance(r, str)]
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            await self.stop_peripherals(peripheral_ids)
+            raise errors[0]
+        return peripheral_ids
+
+    def get(self, peripheral_id: str) -> "BlePeripheral":
+        try:
+            return self.db[peripheral_id]
+        except KeyError:
+            raise UnknownPeripheralError(peripheral_id) from None
+
+    async def stop_peripheral(
+        self, peripheral_id: str, timeout: float | None = None
+    ) -> "PeripheralStatus":
+        """
+        Stop a peripheral and return its final status.
 
+        A peripheral whose transport couldn't be closed (TimedOut or Failed)
+        stays in the database, so stopping it can be retried. A second request
+        while the peripheral is stopping waits for the running stop.
+        """
+        peripheral = self.get(peripheral_id)
+        stopping = self.stopping.get(peripheral_id)
+        if stopping is None:
+            stopping = asyncio.ensure_future(
+                self._stop_peripheral(peripheral_id, peripheral, timeout)
+            )
+            self.stopping[peripheral_id] = stopping
+            stopping.add_done_callback(lambda _: self.stopping.pop(peripheral_id, None))
+        # A cancelled request doesn't leave the peripheral half stopped
+        return await asyncio.shield(stopping)
+
+    async def _stop_peripheral(
+        self,
+        peripheral_id: str,
+        peripheral: "BlePeripheral",
+        timeout: float | None,
+    ) -> "PeripheralStatus":
+        async with self.semaphore:
+            await peripheral.stop_peripheral(
+                self.stop_timeout if timeout is None else timeout
+            )
+        if peripheral.status != PeripheralStatus.Stopped:
+            return peripheral.status
+        # Keep the metrics, they are gone with the peripheral otherwise
+        self.stopped_metrics[peripheral_id] = self.peripheral_metrics(peripheral_id)
         del self.db[peripheral_id]
+        self.allocated_addresses.discard(peripheral.address.upper())
+        while len(self.stopped_metrics) > MAX_STOPPED_METRICS:
+            del self.stopped_metrics[next(iter(self.stopped_metrics))]
+        return peripheral.status
+
+    async def stop_peripherals(
+        self, peripheral_ids: list[str], timeout: float | None = None
+    ) -> dict[str, "PeripheralStatus"]:
+        """
+        Stop the given peripherals concurrently and return their final status.
 
-    async def stop_all(self):
-        for peripheral_id, peripheral in list(self.db.items()):
-            await self.stop_peripheral(peripheral_id)
+        Ids that are given several times are stopped once.
+        """
+        peripheral_ids = list(dict.fromkeys(peripheral_ids))
+        for peripheral_id in peripheral_ids:
+            self.get(peripheral_id)
+        statuses = await asyncio.gather(
+            *(
+                self.stop_peripheral(peripheral_id, timeout)
+                for peripheral_id in peripheral_ids
+            )
+        )
+        return dict(zip(peripheral_ids, statuses))
+
+    async def stop_all(
+        self, timeout: float | None = None, namespace: str | None = None
+    ) -> dict[str, "PeripheralStatus"]:
+        """
+        Stop all peripherals, or only the ones in 'namespace' if it is given.
+        """
+        return await self.stop_peripherals(self.peripheral_ids(namespace), timeout)
+
+    def peripheral_ids(self, namespace: str | None = None) -> list[str]:
+        return [
+            peripheral_id
+            for peripheral_id, peripheral in self.db.items()
+            if namespace is None or peripheral.namespace == namespace
+        ]
+
+    def status(self, peripheral_id: str) -> "PeripheralStatus":
+        return self.get(peripheral_id).status
+
+    def list_peripherals(self, namespace: str | None = None) -> list[dict[str, str]]:
+        return [
+            {"peripheral_id": peripheral_id, "status": self.db[peripheral_id].status}
+            | self.db[peripheral_id].metrics_labels()
+            for peripheral_id in self.peripheral_ids(namespace)
+        ]
+
+    def peripheral_metrics(self, peripheral_id: str) -> dict | None:
+        """
+        Labels, metrics and status of a running or stopped peripheral.
+        """
+        peripheral = self.db.get(peripheral_id)
+        if peripheral is None:
+            return self.stopped_metrics.get(peripheral_id)
+        return (
+            peripheral.metrics_labels()
+            | peripheral.metrics.to_dict()
+            | {"status": peripheral.status}
+        )
+
+    def metrics(self, stopped: bool = False) -> dict[str, dict]:
+        """
+        Metrics of the running peripherals, and of the stopped ones if 'stopped'.
+        """
+        running = {
+            peripheral_id: peripheral.metrics_labels() | peripheral.metrics.to_dict()
+            for peripheral_id, peripheral in self.db.items()
+        }
+        if stopped:
+            return self.stopped_metrics | running
+        return running
 
 
 class Listener(Device.Listener, Connection.Listener):
-    def __init__(self, device):
+    def __init__(self, device, metrics: PeripheralMetrics):
         self.device = device
+        self.metrics = metrics
 
     def on_connection(self, connection):
         print(f"=== Connected to {connection}")
+        self.metrics.record_connection()
         connection.listener = self
 
     def on_disconnection(self, reason):
         print(f"### Disconnected, reason={reason}")
+        self.metrics.record_disconnection()
+
+
+class PeripheralStatus(enum.StrEnum):
+    Created = enum.auto()
+    Starting = enum.auto()
+    Running = enum.auto()
+    Stopping = enum.auto()
+    Stopped = enum.auto()
+    Failed = enum.auto()
+    TimedOut = enum.auto()
 
 
 @dataclasses.dataclass
 class BlePeripheral:
-    def __init__(self):
+    def __init__(
+        self, name: str, address: str, transport_name: str = DEFAULT_TRANSPORT
+    ):
+        self.name = name
+        self.address = address
+        self.transport_name = transport_name
+        # Groups peripherals, e.g. of one test worker, so they can be stopped together
+        self.namespace = ""
         self.transport: Transport | None = None
+        self.device: Device | None = None
         self.wait_task: asyncio.Task | None = None
+        self.notifier_task: asyncio.Task | None = None
+        # Notifications sent in reaction to events, e.g. a new subscription
+        self.pending_notifications: set[asyncio.Task] = set()
+        self.metrics = PeripheralMetrics()
+        self.status = PeripheralStatus.Created
 
     async def start_peripheral(self):
         """
         Peripheral starten
         """
-        print("Opening transport")
-        self.transport = await open_transport("android-netsim")
+        self.status = PeripheralStatus.Starting
+        try:
+            print(f"Opening transport {self.transport_name}")
+            self.transport = await open_peripheral_transport(self.transport_name)
 
-        print("Creating device")
-        device = self.create_device()
+            print("Creating device")
+            self.device = device = self.create_device()
 
-        print("Power device on")
-        await device.power_on()
+            print("Power device on")
+            await device.power_on()
 
-        print("Start advertising")
-        await device.start_advertising(auto_restart=True)
+            print("Start advertising")
+            await device.start_advertising(auto_restart=True)
+        except BaseException:
+            self.status = PeripheralStatus.Failed
+            if self.transport is not None:
+                await self.transport.close()
+            raise
 
         self.wait_task = asyncio.create_task(
             self.transport.source.wait_for_termination()  # type: ignore
         )
+        self.notifier_task = asyncio.create_task(self.run_notifier())
+        self.status = PeripheralStatus.Running
+
+    async def stop_peripheral(self, timeout: float = DEFAULT_STOP_TIMEOUT):
+        """
+        Peripheral stoppen
+        """
+        self.status = PeripheralStatus.Stopping
+        for task in (self.wait_task, self.notifier_task, *self.pending_notifications):
+            if task is not None:
+                task.cancel()
+        try:
+            if self.transport is not None:
+                await asyncio.wait_for(self.transport.close(), timeout)
+        except TimeoutError:
+            self.status = PeripheralStatus.TimedOut
+        except Exception:
+            logging.exception("Closing the transport of %s failed", self.name)
+            self.status = PeripheralStatus.Failed
+        else:
+            self.status = PeripheralStatus.Stopped
+
+    async def notify(self, characteristic: Characteristic, value: Any):
+        """
+        Send a notification with 'value' to all subscribers of 'characteristic'.
+
+        'value' is encoded by the characteristic (e.g. packed by an adapter).
+        Every notification that is sent to a connected subscriber is counted.
+        """
+        assert self.device
+        gatt_server = self.device.gatt_server
+        data = characteristic.encode_value(value)
+        for connection_handle, cccds in list(gatt_server.subscribers.items()):
+            cccd = cccds.get(characteristic.handle)
+            if not cccd or not cccd[0] & 0x01:
+                continue
+            connection = self.device.lookup_connection(connection_handle)
+            if connection is None:
+                # Disconnected since subscribing
+                continue
+            try:
+                await gatt_server.notify_subscriber(connection, characteristic, value)
+            except Exception:
+                logging.exception("Notifying %s failed", connection)
+                continue
+            # Bumble truncates the value to the MTU
+            self.metrics.record_notification(data[: connection.att_mtu - 3])
+
+    def notify_soon(self, characteristic: Characteristic, value: Any):
+        """
+        Send a notification from a synchronous event handler.
+        """
+        task = asyncio.create_task(self.notify(characteristic, value))
+        self.pending_notifications.add(task)
+        task.add_done_callback(self.pending_notifications.discard)
+
+    async def run_notifier(self):
+        """
+        Send the periodic notifications of the peripheral while it is running.
+        """
+
+    def metrics_labels(self) -> dict[str, str]:
+        return {
+            "type": type(self).__name__,
+            "name": self.name,
+            "address": self.address,
+            "transport": self.transport_name,
+            "namespace": self.namespace,
+        }
 
     @abc.abstractmethod
     def create_device(self) -> Device: ...
 
 
 class BlePeripheral_Example(BlePeripheral):
-    def __init__(self, name: str, address: str):
-        super().__init__()
-        self.name = name
-        self.address = address
-
     @override
     def create_device(self) -> Device:
         assert self.transport
@@ -125,12 +405,21 @@ class BlePeripheral_Example(BlePeripheral):
             GATT_MANUFACTURER_NAME_STRING_CHARACTERISTIC,
             Characteristic.Properties.READ,
             Characteristic.READABLE,
-            "Fitbit".encode(),
+            CharacteristicValue(read=self.metrics.metered_read(self.read_fitbit)),
             [descriptor],
         )
         device_info_service = Service(
             GATT_DEVICE_INFORMATION_SERVICE, [manufacturer_name_characteristic]
         )
+        self.hello_characteristic = hello_characteristic = Characteristic(
+            "486F64C6-4B5F-4B3B-8AFF-EDE134A8446A",
+            Characteristic.Properties.READ | Characteristic.Properties.NOTIFY,
+            Characteristic.READABLE,
+            CharacteristicValue(read=self.metrics.metered_read(self.read_hello)),
+        )
+        hello_characteristic.on(
+            Characteristic.EVENT_SUBSCRIPTION, self.on_hello_subscription
+        )
         custom_service1 = Service(
             "50DB505C-8AC4-4738-8448-3B1D9CC09CC5",
             [
@@ -139,7 +428,8 @@ class BlePeripheral_Example(BlePeripheral):
                     Characteristic.Properties.READ | Characteristic.Properties.WRITE,
                     Characteristic.READABLE | Characteristic.WRITEABLE,
                     CharacteristicValue(
-                        read=self.my_custom_read, write=self.my_custom_write
+                        read=self.metrics.metered_read(self.my_custom_read),
+                        write=self.metrics.metered_write(self.my_custom_write),
                     ),
                 ),
                 Characteristic(
@@ -147,48 +437,54 @@ class BlePeripheral_Example(BlePeripheral):
                     Characteristic.Properties.READ | Characteristic.Properties.WRITE,
                     Characteristic.READABLE | Characteristic.WRITEABLE,
                     CharacteristicValue(
-                        read=self.my_custom_read_with_error,
-                        write=self.my_custom_write_with_error,
+                        read=self.metrics.metered_read(self.my_custom_read_with_error),
+                        write=self.metrics.metered_write(
+                            self.my_custom_write_with_error
+                        ),
                     ),
                 ),
-                Characteristic(
-                    "486F64C6-4B5F-4B3B-8AFF-EDE134A8446A",
-                    Characteristic.Properties.READ | Characteristic.Properties.NOTIFY,
-                    Characteristic.READABLE,
-                    bytes("hello", "utf-8"),
-                ),
+                hello_characteristic,
             ],
         )
         device.add_services([device_info_service, custom_service1])
-        device.listener = Listener(device)
+        device.listener = Listener(device, self.metrics)
 
         return device
 
+    def read_fitbit(self, connection):
+        return "Fitbit".encode()
+
+    def read_hello(self, connection):
+        return bytes("hello", "utf-8")
+
+    def on_hello_subscription(self, connection, notify_enabled, indicate_enabled):
+        # Greet every new subscriber
+        if notify_enabled:
+            self.notify_soon(self.hello_characteristic, self.read_hello(connection))
+
     def my_custom_read(self, connection):
-        logging.info("----- READ from", connection)
+        logging.info("----- READ from %s", connection)
         return bytes(f"Hello {connection}", "ascii")
 
     def my_custom_write(self, connection, value):
         logging.info(f"----- WRITE from {connection}: {value}")
 
     def my_custom_read_with_error(self, connection):
-        logging.info("----- READ from", connection, "[returning error]")
+        logging.info("----- READ from %s [returning error]", connection)
         if connection.is_encrypted:
             return bytes([123])
 
         raise ATT_Error(ATT_INSUFFICIENT_ENCRYPTION_ERROR)
 
     def my_custom_write_with_error(self, connection, value):
-        logging.info(f"----- WRITE from {connection}: {value}", "[returning error]")
+        logging.info(f"----- WRITE from {connection}: {value} [returning error]")
         if not connection.is_encrypted:
             raise ATT_Error(ATT_INSUFFICIENT_ENCRYPTION_ERROR)
 
 
 class BlePeripheral_BatteryService(BlePeripheral):
-    def __init__(self, name: str, address: str):
-        super().__init__()
-        self.name = name
-        self.address = address
+    # Seconds between two battery level notifications
+    notify_interval = BATTERY_NOTIFY_INTERVAL
 
     @override
     def create_device(self) -> Device:
@@ -208,7 +504,15 @@ class BlePeripheral_BatteryService(BlePeripheral):
         )
 
         # Add a Battery Service to the GATT sever
-        battery_service = BatteryService(lambda _: random.randint(0, 100))
+        # The battery level is packed into a single byte by the service
+        self.battery_service = battery_service = BatteryService(
+            self.metrics.metered_read(
+                self.read_battery_level,
+                encode=functools.partial(
+                    struct.pack, BatteryService.BATTERY_LEVEL_FORMAT
+                ),
+            )
+        )
         device.add_service(battery_service)
 
         # Set the advertising data
@@ -232,10 +536,25 @@ class BlePeripheral_BatteryService(BlePeripheral):
                 ]
             )
         )
-        device.listener = Listener(device)
+        device.listener = Listener(device, self.metrics)
 
         return device
 
+    def read_battery_level(self, connection) -> int:
+        return random.randint(0, 100)
+
+    @override
+    async def run_notifier(self):
+        while True:
+            await asyncio.sleep(self.notify_interval)
+            try:
+                await self.notify(
+                    self.battery_service.battery_level_characteristic,
+                    self.read_battery_level(None),
+                )
+            except Exception:
+                logging.exception("Notifying the battery level of %s failed", self.name)
+
 
 class BlePeripheralType(enum.StrEnum):
     Example = enum.auto()
@@ -249,7 +568,10 @@ BLE_PERIPHERAL_TYPE_MAPPING = {
 
 
 def create_ble_peripheral(
-    typ: BlePeripheralType, name: str, address: str
+    typ: BlePeripheralType,
+    name: str,
+    address: str,
+    transport_name: str = DEFAULT_TRANSPORT,
 ) -> BlePeripheral:
     cls = BLE_PERIPHERAL_TYPE_MAPPING[typ]
-    return cls(name, address)
+    return cls(name, address, transport_name)
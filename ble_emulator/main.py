@@ -1,15 +1,22 @@
 import contextlib
 import dataclasses
-from typing import AsyncIterator
+import enum
+import inspect
+import json
+from typing import Any, AsyncIterator
 
 from adb_helper import call_adb
 from ble_peripheral import (
     BlePeripheralDatabase,
     BlePeripheralType,
+    UnknownPeripheralError,
     create_ble_peripheral,
 )
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from metrics import render_prometheus
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+from transport_helper import DEFAULT_TRANSPORT
 
 
 @contextlib.asynccontextmanager
@@ -30,6 +37,14 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+@app.exception_handler(UnknownPeripheralError)
+async def unknown_peripheral_handler(request: Request, exc: UnknownPeripheralError):
+    return JSONResponse(
+        status_code=404,
+        content={"detail": str(exc)},
+    )
+
+
 @app.get("/ping/")
 async def ping():
     return "pong"
@@ -56,28 +71,231 @@ async def activate_bluetooth():
         call_adb(["shell", "input", "keyevent", "23"])  # Enter
 
 
+@app.post("/ble_peripheral/allocate_address/")
+async def ble_peripheral_allocate_address():
+    return {"address": app.state.ble_peripherals.allocate_address()}
+
+
 @app.post("/ble_peripheral/start/")
 async def ble_peripheral_start(
-    typ: BlePeripheralType, name: str = "Bumble", address: str = "F0:F1:F2:F3:F4:F5"
+    typ: BlePeripheralType,
+    name: str = "Bumble",
+    address: str | None = None,
+    transport: str = DEFAULT_TRANSPORT,
+    namespace: str = "",
+):
+    """
+    Start a peripheral. Without an address, a unique one is allocated.
+    """
+    db: BlePeripheralDatabase = app.state.ble_peripherals
+    address = address or db.allocate_address()
+    peripheral = create_ble_peripheral(typ, name, address, transport)
+    peripheral_id = await db.start_peripheral(peripheral, namespace)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "GATT server task started",
+            "peripheral_id": peripheral_id,
+            "address": address,
+        },
+    )
+
+
+class BlePeripheralSpec(BaseModel):
+    typ: BlePeripheralType
+    name: str = "Bumble"
+    address: str | None = None
+    transport: str = DEFAULT_TRANSPORT
+
+
+@app.post("/ble_peripheral/start_many/")
+async def ble_peripheral_start_many(
+    specs: list[BlePeripheralSpec], namespace: str = ""
 ):
-    peripheral = create_ble_peripheral(typ, name, address)
-    await peripheral.start_peripheral()
-    peripheral_id = app.state.ble_peripherals.add_peripheral(peripheral)
+    db: BlePeripheralDatabase = app.state.ble_peripherals
+    peripherals = [
+        create_ble_peripheral(
+            spec.typ,
+            spec.name,
+            spec.address or db.allocate_address(),
+            spec.transport,
+        )
+        for spec in specs
+    ]
+    peripheral_ids = await db.start_peripherals(peripherals, namespace)
     return JSONResponse(
         status_code=200,
-        content={"status": "GATT server task started", "peripheral_id": peripheral_id},
+        content={
+            "status": "GATT server tasks started",
+            "peripheral_ids": peripheral_ids,
+            "addresses": [peripheral.address for peripheral in peripherals],
+        },
     )
 
 
 @app.post("/ble_peripheral/stop/")
-async def ble_peripheral_stop(peripheral_id: str):
-    app.state.ble_peripherals.stop_peripheral(peripheral_id)
+async def ble_peripheral_stop(peripheral_id: str, timeout: float | None = None):
+    db: BlePeripheralDatabase = app.state.ble_peripherals
+    status = await db.stop_peripheral(peripheral_id, timeout)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "Peripheral stopped",
+            "peripheral_status": status,
+            "metrics": db.peripheral_metrics(peripheral_id),
+        },
+    )
+
+
+@app.post("/ble_peripheral/stop_many/")
+async def ble_peripheral_stop_many(
+    peripheral_ids: list[str] = Body(), timeout: float | None = None
+):
+    db: BlePeripheralDatabase = app.state.ble_peripherals
+    statuses = await db.stop_peripherals(peripheral_ids, timeout)
     return JSONResponse(
         status_code=200,
-        content={"status": "Peripheral stopped"},
+        content={
+            "status": "Peripherals stopped",
+            "peripheral_status": statuses,
+            "metrics": {
+                peripheral_id: db.peripheral_metrics(peripheral_id)
+                for peripheral_id in statuses
+            },
+        },
     )
 
 
+@app.post("/ble_peripheral/stop_all/")
+async def ble_peripheral_stop_all(
+    timeout: float | None = None, namespace: str | None = None
+):
+    statuses = await app.state.ble_peripherals.stop_all(timeout, namespace)
+    return JSONResponse(
+        status_code=200,
+        content={"status": "Peripherals stopped", "peripheral_status": statuses},
+    )
+
+
+@app.get("/ble_peripheral/list/")
+async def ble_peripheral_list(namespace: str | None = None):
+    return app.state.ble_peripherals.list_peripherals(namespace)
+
+
+@app.get("/ble_peripheral/status/")
+async def ble_peripheral_status(peripheral_id: str):
+    return {
+        "peripheral_id": peripheral_id,
+        "peripheral_status": app.state.ble_peripherals.status(peripheral_id),
+    }
+
+
+class MetricsFormat(enum.StrEnum):
+    Json = "json"
+    Prometheus = "prometheus"
+
+
+@app.get("/metrics/")
+async def metrics(format: MetricsFormat = MetricsFormat.Json, stopped: bool = False):
+    """
+    Metrics of the running peripherals. With 'stopped', the JSON format also
+    contains the final metrics of stopped peripherals.
+    """
+    db: BlePeripheralDatabase = app.state.ble_peripherals
+    if format == MetricsFormat.Prometheus:
+        return PlainTextResponse(
+            render_prometheus(
+                (
+                    peripheral.metrics_labels() | {"peripheral_id": peripheral_id},
+                    peripheral.metrics,
+                )
+                for peripheral_id, peripheral in db.db.items()
+            ),
+            media_type="text/plain; version=0.0.4",
+        )
+    return JSONResponse(status_code=200, content=db.metrics(stopped))
+
+
+class BatchOperation(BaseModel):
+    op: str
+    params: dict[str, Any] = {}
+
+
+# Operations that can be combined into a single request with /batch/
+BATCH_OPERATIONS = {
+    "ping": ping,
+    "grant_permission": grant_permission,
+    "revoke_permission": revoke_permission,
+    "activate_bluetooth": activate_bluetooth,
+    "ble_peripheral_allocate_address": ble_peripheral_allocate_address,
+    "ble_peripheral_start": ble_peripheral_start,
+    "ble_peripheral_start_many": ble_peripheral_start_many,
+    "ble_peripheral_stop": ble_peripheral_stop,
+    "ble_peripheral_stop_many": ble_peripheral_stop_many,
+    "ble_peripheral_stop_all": ble_peripheral_stop_all,
+    "ble_peripheral_list": ble_peripheral_list,
+    "ble_peripheral_status": ble_peripheral_status,
+}
+
+
+def params_model(op: str, endpoint) -> type[BaseModel]:
+    """
+    Model of the parameters of 'endpoint', built from its signature.
+
+    The batch operations are validated and converted like the requests of
+    the endpoints (e.g. strings to enums, dicts to models).
+    """
+    fields = {}
+    for parameter in inspect.signature(endpoint).parameters.values():
+        default = (
+            ... if parameter.default is inspect.Parameter.empty else parameter.default
+        )
+        fields[parameter.name] = (parameter.annotation, default)
+    return create_model(f"{op}_params", __config__=ConfigDict(extra="forbid"), **fields)
+
+
+BATCH_PARAMS = {
+    op: params_model(op, endpoint) for op, endpoint in BATCH_OPERATIONS.items()
+}
+
+
+@app.post("/batch/")
+async def batch(operations: list[BatchOperation], stop_on_error: bool = True):
+    """
+    Run several operations one after another in a single request.
+
+    The response contains one entry per executed operation, either with its
+    "result" or with its "error".
+    """
+    results = []
+    for operation in operations:
+        try:
+            if operation.op not in BATCH_OPERATIONS:
+                raise ValueError(f"Unknown operation: {operation.op}")
+            params = BATCH_PARAMS[operation.op].model_validate(operation.params)
+            result = await BATCH_OPERATIONS[operation.op](**dict(params))
+        except ValidationError as exc:
+            results.append(
+                {
+                    "op": operation.op,
+                    "error": "Invalid parameters",
+                    "detail": exc.errors(include_url=False, include_context=False),
+                }
+            )
+            if stop_on_error:
+                break
+            continue
+        except Exception as exc:
+            results.append({"op": operation.op, "error": str(exc)})
+            if stop_on_error:
+                break
+            continue
+        if isinstance(result, Response):
+            result = json.loads(result.body)
+        results.append({"op": operation.op, "result": result})
+    return results
+
+
 if __name__ == "__main__":
     import uvicorn
 
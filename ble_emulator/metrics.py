@@ -0,0 +1,166 @@
+import dataclasses
+import functools
+import time
+from typing import Any, Callable, Iterable
+
+from bumble.att import ATT_Error
+
+
+@dataclasses.dataclass
+class PeripheralMetrics:
+    """
+    Counters of a single emulated peripheral.
+    """
+
+    connections: int = 0
+    disconnections: int = 0
+    active_connections: int = 0
+    reads: int = 0
+    writes: int = 0
+    notifications: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    bytes_notified: int = 0
+    att_errors: int = 0
+    handler_calls: int = 0
+    handler_latency_seconds_total: float = 0.0
+    handler_latency_seconds_max: float = 0.0
+
+    def record_connection(self):
+        self.connections += 1
+        self.active_connections += 1
+
+    def record_disconnection(self):
+        self.disconnections += 1
+        self.active_connections = max(0, self.active_connections - 1)
+
+    def record_notification(self, value: bytes):
+        self.notifications += 1
+        self.bytes_notified += len(value)
+
+    def record_handler_latency(self, seconds: float):
+        self.handler_calls += 1
+        self.handler_latency_seconds_total += seconds
+        self.handler_latency_seconds_max = max(
+            self.handler_latency_seconds_max, seconds
+        )
+
+    def metered_read(
+        self,
+        func: Callable[[Any], Any],
+        encode: Callable[[Any], bytes] | None = None,
+    ) -> Callable[[Any], Any]:
+        """
+        Wrap a read handler of a CharacteristicValue, so that every call is counted.
+
+        If the handler doesn't return bytes, because its value is encoded later
+        (e.g. by a PackedCharacteristicAdapter), 'encode' gives the bytes that
+        are sent to the client.
+        """
+
+        @functools.wraps(func)
+        def wrapper(connection):
+            start = time.perf_counter()
+            try:
+                value = func(connection)
+            except ATT_Error:
+                self.att_errors += 1
+                raise
+            finally:
+                self.record_handler_latency(time.perf_counter() - start)
+            self.reads += 1
+            data = value if encode is None else encode(value)
+            if isinstance(data, (bytes, bytearray)):
+                self.bytes_read += len(data)
+            return value
+
+        return wrapper
+
+    def metered_write(
+        self, func: Callable[[Any, bytes], None]
+    ) -> Callable[[Any, bytes], None]:
+        """
+        Wrap a write handler of a CharacteristicValue, so that every call is counted.
+        """
+
+        @functools.wraps(func)
+        def wrapper(connection, value):
+            start = time.perf_counter()
+            try:
+                func(connection, value)
+            except ATT_Error:
+                self.att_errors += 1
+                raise
+            finally:
+                self.record_handler_latency(time.perf_counter() - start)
+            self.writes += 1
+            if isinstance(value, (bytes, bytearray)):
+                self.bytes_written += len(value)
+
+        return wrapper
+
+    def to_dict(self) -> dict[str, int | float]:
+        return dataclasses.asdict(self)
+
+
+# (metric name, prometheus type, help text, attribute of PeripheralMetrics).
+# Summaries map the suffixes of their samples to attributes instead.
+PROMETHEUS_METRICS: list[tuple[str, str, str, str | dict[str, str]]] = [
+    ("connections_total", "counter", "Accepted connections", "connections"),
+    ("disconnections_total", "counter", "Closed connections", "disconnections"),
+    ("active_connections", "gauge", "Open connections", "active_connections"),
+    ("reads_total", "counter", "Successful GATT reads", "reads"),
+    ("writes_total", "counter", "Successful GATT writes", "writes"),
+    ("notifications_total", "counter", "Sent notifications", "notifications"),
+    ("read_bytes_total", "counter", "Bytes returned by reads", "bytes_read"),
+    ("written_bytes_total", "counter", "Bytes received by writes", "bytes_written"),
+    (
+        "notified_bytes_total",
+        "counter",
+        "Bytes sent by notifications",
+        "bytes_notified",
+    ),
+    ("att_errors_total", "counter", "ATT errors raised by handlers", "att_errors"),
+    (
+        "handler_latency_seconds",
+        "summary",
+        "Time spent in handlers",
+        {"_count": "handler_calls", "_sum": "handler_latency_seconds_total"},
+    ),
+    (
+        "handler_latency_seconds_max",
+        "gauge",
+        "Slowest handler call",
+        "handler_latency_seconds_max",
+    ),
+]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(
+    peripherals: Iterable[tuple[dict[str, str], PeripheralMetrics]],
+    prefix: str = "ble_emulator_peripheral_",
+) -> str:
+    """
+    Render the metrics of all peripherals in the Prometheus text exposition format.
+
+    'peripherals' yields tuples of labels and metrics.
+    """
+    peripherals = list(peripherals)
+    lines = []
+    for name, typ, help_text, attrs in PROMETHEUS_METRICS:
+        lines.append(f"# HELP {prefix}{name} {help_text}")
+        lines.append(f"# TYPE {prefix}{name} {typ}")
+        samples = attrs if isinstance(attrs, dict) else {"": attrs}
+        for labels, metrics in peripherals:
+            label_str = ",".join(
+                f'{key}="{_escape_label_value(value)}"' for key, value in labels.items()
+            )
+            for suffix, attr in samples.items():
+                lines.append(
+                    f"{prefix}{name}{suffix}{{{label_str}}} {getattr(metrics, attr)}"
+                )
+    return "\n".join(lines) + "\n"
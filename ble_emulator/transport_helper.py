@@ -0,0 +1,73 @@
+import os
+
+from bumble.controller import Controller
+from bumble.link import LocalLink
+from bumble.transport import open_transport
+from bumble.transport.common import AsyncPipeSink, Transport
+
+LOCAL_TRANSPORT_SCHEME = "local"
+
+DEFAULT_TRANSPORT = os.environ.get("BLE_EMULATOR_TRANSPORT", "android-netsim")
+
+_local_links: dict[str, LocalLink] = {}
+
+
+class LocalLinkTransport(Transport):
+    """
+    In-process transport that attaches a virtual bumble controller to a LocalLink.
+
+    All controllers on the same link can see each other's advertisements and
+    connect to each other, so peripherals and a bumble based central can run
+    in the same process without any radio or Android emulator.
+    """
+
+    def __init__(self, controller: Controller):
+        super().__init__(controller, AsyncPipeSink(controller))
+        self.controller = controller
+
+    async def close(self) -> None:
+        self.controller.stop_advertising()
+        if self.controller.link is not None:
+            self.controller.link.remove_controller(self.controller)
+        if not self.controller.terminated.done():
+            self.controller.terminated.set_result(None)
+
+
+def get_local_link(name: str = "default") -> LocalLink:
+    """
+    Get the in-process link with the given name, creating it on first use.
+    """
+    link = _local_links.get(name)
+    if link is None:
+        link = LocalLink()
+        _local_links[name] = link
+    return link
+
+
+def parse_local_transport(transport: str) -> str | None:
+    """
+    Return the link name of a "local" or "local:<link-name>" transport spec,
+    or None if the spec names any other bumble transport.
+    """
+    scheme, _, link_name = transport.partition(":")
+    if scheme != LOCAL_TRANSPORT_SCHEME:
+        return None
+    return link_name or "default"
+
+
+async def open_peripheral_transport(
+    transport: str = DEFAULT_TRANSPORT, controller_name: str = "Bumble"
+) -> Transport:
+    """
+    Open the transport for an emulated device.
+
+    "local" and "local:<link-name>" create a virtual controller on an
+    in-process link. Every other value is passed on to bumble's
+    `open_transport` (e.g. "android-netsim", "usb:0", "tcp-client:...").
+    """
+    link_name = parse_local_transport(transport)
+    if link_name is None:
+        return await open_transport(transport)
+
+    controller = Controller(controller_name, link=get_local_link(link_name))
+    return LocalLinkTransport(controller)
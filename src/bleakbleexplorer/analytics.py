@@ -0,0 +1,214 @@
+"""
+RSSI analytics over the whole device table.
+
+The RSSI of a single advertisement is very noisy. RssiAnalytics collects the
+samples of all devices and updates smoothed values, their spread and an
+estimated distance for all devices at once with vectorized NumPy operations,
+so a periodic update stays cheap even with thousands of devices.
+"""
+
+import math
+from typing import Literal, NamedTuple
+
+import numpy as np
+
+# RSSI at 1 m, if the device doesn't advertise its TX power
+DEFAULT_REFERENCE_RSSI = -59.0
+# Attenuation between the antenna (advertised TX power) and 1 m distance
+TX_POWER_TO_1M = 41.0
+
+
+class RssiStats(NamedTuple):
+    smoothed: float
+    # Spread of the RSSI around the EMA ("ema" smoothing) or standard error
+    # of the Kalman estimate ("kalman" smoothing)
+    std: float
+    # Estimated distance in meters
+    distance: float
+    samples: int
+
+    def __str__(self) -> str:
+        return f"{self.smoothed:.0f} dBm ±{self.std:.0f}, ~{self.distance:.1f} m"
+
+
+class RssiAnalytics:
+    """Smoothing and distance estimation of the RSSI of many devices.
+
+    'add_sample' only queues the sample. 'update' processes all queued
+    samples of all devices at once:
+
+    - EMA with 'alpha' and exponentially weighted variance
+    - Kalman filter for a random walk with 'process_noise' per update and
+      'measurement_noise' per sample (both in dB²). The reported std is the
+      square root of its error covariance.
+    - Log-distance path loss model with 'path_loss_exponent'
+
+    Several samples of a device within one update are combined into their
+    mean, weighted by their number.
+    """
+
+    def __init__(
+        self,
+        smoothing: Literal["kalman", "ema"] = "kalman",
+        alpha: float = 0.3,
+        process_noise: float = 1.0,
+        measurement_noise: float = 16.0,
+        path_loss_exponent: float = 2.0,
+        capacity: int = 256,
+    ):
+        self.smoothing = smoothing
+        self.alpha = alpha
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.path_loss_exponent = path_loss_exponent
+
+        self.capacity = capacity
+        self.reset()
+
+    def reset(self):
+        """Forget all devices, e.g. when a new scan starts."""
+        self.addresses: list[str] = []
+        self.rows: dict[str, int] = {}
+        # Queued samples
+        self._sample_rows: list[int] = []
+        self._sample_rssi: list[float] = []
+
+        self.samples = np.zeros(self.capacity, dtype=np.int64)
+        self.ema = np.zeros(self.capacity)
+        self.variance = np.zeros(self.capacity)
+        self.estimate = np.zeros(self.capacity)
+        self.covariance = np.zeros(self.capacity)
+        self.reference_rssi = np.full(self.capacity, DEFAULT_REFERENCE_RSSI)
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def _row(self, address: str) -> int:
+        row = self.rows.get(address)
+        if row is None:
+            row = len(self.addresses)
+            if row == len(self.samples):
+                self._grow()
+            self.rows[address] = row
+            self.addresses.append(address)
+        return row
+
+    def _grow(self):
+        capacity = 2 * len(self.samples)
+        for name in ("samples", "ema", "variance", "estimate", "covariance"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[: len(array)] = array
+            setattr(self, name, grown)
+        grown = np.full(capacity, DEFAULT_REFERENCE_RSSI)
+        grown[: len(self.reference_rssi)] = self.reference_rssi
+        self.reference_rssi = grown
+
+    def add_sample(self, address: str, rssi: float, tx_power: int | None = None):
+        row = self._row(address)
+        self._sample_rows.append(row)
+        self._sample_rssi.append(rssi)
+        if tx_power is not None:
+            self.reference_rssi[row] = tx_power - TX_POWER_TO_1M
+
+    def update(self) -> dict[str, RssiStats]:
+        """Process the queued samples. Returns the stats of updated devices."""
+        if not self._sample_rows:
+            return {}
+        n = len(self.addresses)
+        sample_rows = np.array(self._sample_rows)
+        sample_rssi = np.array(self._sample_rssi, dtype=np.float64)
+        self._sample_rows.clear()
+        self._sample_rssi.clear()
+
+        counts = np.bincount(sample_rows, minlength=n)
+        sums = np.bincount(sample_rows, weights=sample_rssi, minlength=n)
+        updated = np.flatnonzero(counts)
+        count = counts[updated]
+        mean = sums[updated] / count
+
+        previous = self.samples[updated]
+        first = previous == 0
+
+        # EMA and exponentially weighted variance. 'count' samples with the
+        # same value move the EMA as far as one step with 'weight'.
+        ema = self.ema[updated]
+        variance = self.variance[updated]
+        weight = 1.0 - (1.0 - self.alpha) ** count
+        delta = mean - ema
+        ema = np.where(first, mean, ema + weight * delta)
+        variance = np.where(first, 0.0, (1.0 - weight) * (variance + weight * delta**2))
+
+        # Kalman filter with the mean of 'count' samples as measurement
+        estimate = self.estimate[updated]
+        covariance = self.covariance[updated] + self.process_noise
+        measurement_noise = self.measurement_noise / count
+        gain = covariance / (covariance + measurement_noise)
+        estimate = np.where(first, mean, estimate + gain * (mean - estimate))
+        covariance = np.where(first, measurement_noise, (1.0 - gain) * covariance)
+
+        self.ema[updated] = ema
+        self.variance[updated] = variance
+        self.estimate[updated] = estimate
+        self.covariance[updated] = covariance
+        self.samples[updated] = previous + count
+
+        if self.smoothing == "ema":
+            smoothed, std = ema, np.sqrt(variance)
+        else:
+            smoothed, std = estimate, np.sqrt(covariance)
+        distance = self._distance(self.reference_rssi[updated], smoothed)
+        addresses = [self.addresses[row] for row in updated.tolist()]
+        return dict(
+            zip(
+                addresses,
+                map(
+                    RssiStats,
+                    smoothed.tolist(),
+                    std.tolist(),
+                    distance.tolist(),
+                    self.samples[updated].tolist(),
+                ),
+            )
+        )
+
+    def smoothed_values(self) -> np.ndarray:
+        n = len(self.addresses)
+        if self.smoothing == "ema":
+            return self.ema[:n]
+        return self.estimate[:n]
+
+    def _distance(self, reference_rssi, rssi):
+        return 10.0 ** ((reference_rssi - rssi) / (10.0 * self.path_loss_exponent))
+
+    def distances(self) -> np.ndarray:
+        """Estimated distance in meters of all devices."""
+        n = len(self.addresses)
+        return self._distance(self.reference_rssi[:n], self.smoothed_values())
+
+    def smoothed(self, address: str) -> float | None:
+        row = self.rows.get(address)
+        if row is None or self.samples[row] == 0:
+            return None
+        return float(self.smoothed_values()[row])
+
+    def stats(self, address: str) -> RssiStats | None:
+        row = self.rows.get(address)
+        if row is None or self.samples[row] == 0:
+            return None
+        smoothed = float(self.smoothed_values()[row])
+        if self.smoothing == "ema":
+            variance = self.variance[row]
+        else:
+            variance = self.covariance[row]
+        return RssiStats(
+            smoothed=smoothed,
+            std=math.sqrt(variance),
+            distance=float(self._distance(self.reference_rssi[row], smoothed)),
+            samples=int(self.samples[row]),
+        )
+
+    def ranking(self) -> list[str]:
+        """Addresses ordered by smoothed RSSI, the closest device first."""
+        order = np.argsort(-self.smoothed_values(), kind="stable")
+        return [self.addresses[row] for row in order if self.samples[row] > 0]
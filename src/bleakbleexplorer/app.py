@@ -2,10 +2,17 @@
 Example Applikation for the BLE Library "bleak"
 """
 
+import os
+
 import toga
 from bleakbleexplorer.ble_scan_box import BLEScanBox
+from bleakbleexplorer.diagnostics import diagnostics
+from bleakbleexplorer.export import exports
+from bleakbleexplorer.processing import processing_pool
+from bleakbleexplorer.profiling import profiler, trace_path
 
-toga.Widget.DEBUG_LAYOUT_ENABLED = True
+if os.environ.get("BLEAK_EXPLORER_DEBUG_LAYOUT"):
+    toga.Widget.DEBUG_LAYOUT_ENABLED = True
 
 
 class BleakBLEExplorer(toga.App):
@@ -18,15 +25,44 @@ class BleakBLEExplorer(toga.App):
 
     def startup(self):
         """Set up the GUI."""
+        self.trace_path = trace_path(self.paths.data)
+        if self.trace_path is not None:
+            profiler.install()
+
         main_window = toga.MainWindow(title="BLE Scanner Demo App")
 
         main_box = BLEScanBox(main_window)
 
         main_window.content = main_box
+        diagnostics.screen_shown("scan")
+
+        self.commands.add(
+            toga.Command(
+                self.show_diagnostics,
+                text="Diagnostics",
+                group=toga.Group.HELP,
+            )
+        )
 
         self.main_window = main_window
         main_window.show()
 
+    async def show_diagnostics(self, command: toga.Command, **kwargs):
+        """Show the live widgets, rows, tasks and the memory growth."""
+        report = diagnostics.format_report()
+        # Also in the log, to compare it with later reports
+        print(report)
+        await self.main_window.dialog(toga.InfoDialog("Diagnostics", report))
+
+    def on_exit(self):
+        # Write the records that are still queued for export
+        exports.stop()
+        processing_pool.shutdown()
+        if self.trace_path is not None:
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.write_trace(self.trace_path)
+        return True
+
 
 def main():
     return BleakBLEExplorer()
@@ -1,4 +1,5 @@
 import asyncio
+import traceback
 
 import toga
 from bleak import BleakClient
@@ -10,7 +11,18 @@ from bleak.backends.service import BleakGATTService, BleakGATTServiceCollection
 from toga.style import Pack
 from toga.style.pack import COLUMN, ROW  # type: ignore
 
+from bleakbleexplorer.charts import TimeSeriesChart
 from bleakbleexplorer.custom_list_view import CustomListRow, CustomListView
+from bleakbleexplorer.diagnostics import diagnostics
+from bleakbleexplorer.export import exports
+from bleakbleexplorer.formatting import (
+    NUMERIC_FORMATS,
+    PRESENTATION_FORMAT_UUID,
+    NumericFormat,
+    format_value,
+    presentation_format,
+)
+from bleakbleexplorer.gatt_cache import GattReadCache
 
 
 class ServiceRow(CustomListRow):
@@ -27,13 +39,24 @@ class ServiceRow(CustomListRow):
         self.add(box)
 
 
+# Notifications are only charted with a known format
+NOT_CHARTED = "not charted"
+
+
 class CharacteristicRow(CustomListRow):
-    def __init__(self, client: BleakClient, characteristic: BleakGATTCharacteristic):
+    def __init__(self, cache: GattReadCache, characteristic: BleakGATTCharacteristic):
         super().__init__()
-        self.client = client
+        self.cache = cache
         self.characteristic = characteristic
+        self.notifying = False
+        # From the presentation format descriptor or picked by the user
+        self.value_format: NumericFormat | None = None
+        # Created with the first notification that has the value format
+        self.value_chart: TimeSeriesChart | None = None
+        self.format_selection: toga.Selection | None = None
 
         box = toga.Box(style=Pack(direction=COLUMN, margin=5, flex=1))
+        self.content_box = box
 
         label = toga.Label("Characteristic", style=Pack(font_weight="bold"))
         box.add(label)
@@ -49,16 +72,86 @@ class CharacteristicRow(CustomListRow):
         for prop in characteristic.properties:
             if prop == "read":
                 btn = toga.Button(text="Read", on_press=self.read)
+                button_box.add(btn)
+                btn = toga.Button(text="Refresh", on_press=self.force_refresh)
+            elif prop in ("notify", "indicate"):
+                btn = toga.Button(text=prop, on_press=self.toggle_notify)
             else:
                 btn = toga.Button(text=prop, enabled=False)
             button_box.add(btn)
+        if {"notify", "indicate"} & set(characteristic.properties):
+            self.format_selection = toga.Selection(
+                items=[NOT_CHARTED, *NUMERIC_FORMATS],
+                on_change=self.on_format_change,
+            )
+            button_box.add(self.format_selection)
         box.add(button_box)
 
         self.add(box)
 
+    def show_value(self, data: bytes | bytearray):
+        self.data_lbl.text = format_value(data)
+
     async def read(self, widget: toga.Widget):
-        data = await self.client.read_gatt_char(self.characteristic)
-        self.data_lbl.text = str(data)
+        self.show_value(await self.cache.read(self.characteristic))
+
+    async def force_refresh(self, widget: toga.Widget):
+        """Read the value from the device, even if it is cached."""
+        self.show_value(await self.cache.read(self.characteristic, force_refresh=True))
+
+    def on_notification(self, sender: BleakGATTCharacteristic, data: bytearray):
+        exports.write_notification(self.cache.client.address, sender, data)
+        if self.value_format is not None:
+            value = self.value_format.decode(data)
+            if value is not None:
+                if self.value_chart is None:
+                    self.value_chart = TimeSeriesChart()
+                    self.content_box.add(self.value_chart)
+                self.value_chart.append(value)
+        self.show_value(data)
+
+    def on_format_change(self, widget: toga.Selection):
+        self.value_format = NUMERIC_FORMATS.get(widget.value)
+        # Values of different formats don't belong in one chart
+        self.remove_chart()
+
+    async def read_presentation_format(self):
+        """Chart the notifications with the format of the characteristic."""
+        descriptor = self.characteristic.get_descriptor(PRESENTATION_FORMAT_UUID)
+        if descriptor is None or self.format_selection is None:
+            return
+        data = await self.cache.client.read_gatt_descriptor(descriptor.handle)
+        result = presentation_format(data)
+        if result is not None:
+            name, value_format = result
+            self.format_selection.value = name
+            # With the exponent of the descriptor
+            self.value_format = value_format
+
+    def remove_chart(self):
+        if self.value_chart is not None:
+            self.value_chart.close()
+            self.content_box.remove(self.value_chart)
+            self.value_chart = None
+
+    def close(self):
+        if self.value_chart is not None:
+            self.value_chart.close()
+
+    async def toggle_notify(self, widget: toga.Widget):
+        if self.notifying:
+            await self.cache.stop_notify(self.characteristic)
+            self.notifying = False
+            widget.text = widget.text.removeprefix("stop ")
+        else:
+            if self.value_format is None:
+                try:
+                    await self.read_presentation_format()
+                except Exception:
+                    traceback.print_exc()
+            await self.cache.start_notify(self.characteristic, self.on_notification)
+            self.notifying = True
+            widget.text = f"stop {widget.text}"
 
 
 class DescriptorRow(CustomListRow):
@@ -78,12 +171,12 @@ class DescriptorRow(CustomListRow):
 
 
 class BLEServiceListView(CustomListView):
-    def set_services(self, client: BleakClient, services: BleakGATTServiceCollection):
+    def set_services(self, cache: GattReadCache, services: BleakGATTServiceCollection):
         self.clear()
         for service in services:
             self.add_row(ServiceRow(service))
             for characteristic in service.characteristics:
-                self.add_row(CharacteristicRow(client, characteristic))
+                self.add_row(CharacteristicRow(cache, characteristic))
                 for descriptor in characteristic.descriptors:
                     self.add_row(DescriptorRow(descriptor))
 
@@ -108,6 +201,7 @@ class BLEDeviceBox(toga.Box):
         )
 
         self.connecting_lbl = toga.Label("")
+        self.cache_stats_lbl = toga.Label("")
 
         self.services_view = BLEServiceListView(
             style=Pack(direction=COLUMN, flex=1),
@@ -118,9 +212,13 @@ class BLEDeviceBox(toga.Box):
         self.add(title)
 
         self.add(self.connecting_lbl)
+        self.add(self.cache_stats_lbl)
         self.add(self.services_view)
 
-        self.con_task = asyncio.create_task(self.connection_task(self.device))
+        self.con_task = diagnostics.track_task(
+            asyncio.create_task(self.connection_task(self.device)),
+            "BLEDeviceBox.connection_task",
+        )
         self.client: BleakClient | None = None
 
     async def connection_task(self, device: BLEDevice):
@@ -129,10 +227,15 @@ class BLEDeviceBox(toga.Box):
             try:
                 async with BleakClient(device) as client:
                     self.client = client
+                    # Cached values are only valid for this connection
+                    cache = GattReadCache(client)
                     self.connecting_lbl.text = "Connected"
-                    self.services_view.set_services(client, client.services)
+                    self.services_view.set_services(cache, client.services)
                     while True:
                         await asyncio.sleep(0.2)
+                        stats = str(cache.stats)
+                        if self.cache_stats_lbl.text != stats:
+                            self.cache_stats_lbl.text = stats
                         if client.is_connected is False:
                             break
                 self.connecting_lbl.text = "Disconnected. Try reconnecting..."
@@ -140,7 +243,13 @@ class BLEDeviceBox(toga.Box):
             except Exception as e:
                 self.connecting_lbl.text = f"ERROR: {e}"
 
-    def show_main_box(self, widget: toga.Widget):
+    def close(self):
+        """Stop the connection task and release the listed services."""
         self.con_task.cancel()
+        self.services_view.clear()
+
+    def show_main_box(self, widget: toga.Widget):
+        self.close()
         self.main_window.content = self.parent_box
         self.main_window.content = self.parent_box
+        diagnostics.screen_shown("scan")
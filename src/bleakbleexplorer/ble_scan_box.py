@@ -1,4 +1,5 @@
 import asyncio
+import time
 import traceback
 from typing import Callable
 
@@ -9,8 +10,26 @@ from bleak.backends.scanner import AdvertisementData
 from toga.style import Pack
 from toga.style.pack import COLUMN, ROW  # type: ignore
 
+from bleakbleexplorer.analytics import RssiAnalytics, RssiStats
 from bleakbleexplorer.ble_device_box import BLEDeviceBox
+from bleakbleexplorer.charts import TimeSeriesChart
 from bleakbleexplorer.custom_list_view import CustomListRow, CustomListView
+from bleakbleexplorer.dedup import (
+    DEFAULT_RSSI_THRESHOLD,
+    AdvertisementDeduplicator,
+    UpdateKind,
+    classify_batch,
+)
+from bleakbleexplorer.diagnostics import diagnostics
+from bleakbleexplorer.downsample import MinMaxPyramid
+from bleakbleexplorer.export import FORMATS, exports
+from bleakbleexplorer.formatting import (
+    advertisement_content_key,
+    format_advertisement,
+)
+from bleakbleexplorer.processing import BatchProcessor, processing_pool
+from bleakbleexplorer.scan_query import wait_until_settled
+from bleakbleexplorer.scan_scheduler import CycleStats, ScanSchedule, ScanScheduler
 
 
 class BLEDeviceRow(CustomListRow):
@@ -25,6 +44,16 @@ class BLEDeviceRow(CustomListRow):
         self.adv_data = adv_data
         self.on_connect = on_connect
         self.details_shown = False
+        # Smoothed RSSI, shown instead of the RSSI of the latest advertisement
+        self.rssi_stats: RssiStats | None = None
+        # Smoothed RSSI of the current label text
+        self.labelled_rssi: float | None = None
+        # Smoothed RSSI of the whole session, shown in the details
+        self.rssi_history = MinMaxPyramid()
+        # The details pane is created on first use and kept while collapsed.
+        # It is only rendered again if the advertisement content changed.
+        self.details_box: toga.Box | None = None
+        self.rendered_content_key: tuple | None = None
 
         self.divider_box = toga.Box(style=Pack(direction=COLUMN, flex=1))
         infos_box = toga.Box(style=Pack(direction=ROW, flex=1))
@@ -50,14 +79,13 @@ class BLEDeviceRow(CustomListRow):
         infos_box.add(name_box)
 
         buttons_box = toga.Box(style=Pack(direction=COLUMN, margin=5))
-        buttons_box.add(
-            toga.Label(
-                f"{adv_data.rssi} dBm",
-                style=Pack(
-                    margin_left=1,
-                ),
+        self.rssi_lbl = toga.Label(
+            f"{adv_data.rssi} dBm",
+            style=Pack(
+                margin_left=1,
             ),
         )
+        buttons_box.add(self.rssi_lbl)
         buttons_box.add(
             toga.Button(
                 "Connect",
@@ -89,36 +117,62 @@ class BLEDeviceRow(CustomListRow):
             self.details_shown = True
             self.details_btn.text = "Hide Details"
         else:
+            self.rssi_chart.close()
             self.divider_box.remove(self.divider)
             self.divider_box.remove(self.details_box)
             self.details_shown = False
             self.details_btn.text = "Show Details"
 
     def show_details(self):
-        self.divider = toga.Divider()
+        if self.details_box is None:
+            self.divider = toga.Divider()
+            self.details_box = toga.Box(style=Pack(direction=COLUMN, flex=1))
+            self.adv_data_txt = toga.MultilineTextInput(style=Pack(flex=1))
+            self.details_box.add(self.adv_data_txt)
+            self.rssi_chart = TimeSeriesChart(self.rssi_history)
+            self.details_box.add(self.rssi_chart)
+
+        self.render_details()
+        self.rssi_chart.schedule_redraw()
         self.divider_box.add(self.divider)
-
-        self.details_box = toga.Box(style=Pack(direction=ROW, flex=1))
-
-        self.adv_data_txt = toga.MultilineTextInput(style=Pack(flex=1))
-        self.divider_box.add(self.adv_data_txt)
-        s = ""
-        for company_id, data in self.adv_data.manufacturer_data.items():
-            s += "Manufacturer Data:\n"
-            s += f"Company: 0x{company_id:04X}\n"
-            s += f"0x{data.hex().upper()}\n"
-        for key, data in self.adv_data.service_data.items():
-            s += f"Service Data ({key}):\n"
-            s += f"0x{data.hex().upper()}\n"
-        if self.adv_data.tx_power:
-            s += f"TX-Power: {self.adv_data.tx_power}\n"
-        for service_uuid in self.adv_data.service_uuids:
-            s += f"Service UUID: {service_uuid}\n"
-        self.adv_data_txt.value = s
-
-        self.details_box.add(self.adv_data_txt)
         self.divider_box.add(self.details_box)
 
+    def render_details(self):
+        content_key = advertisement_content_key(self.adv_data)
+        if content_key == self.rendered_content_key:
+            return
+        self.rendered_content_key = content_key
+        self.adv_data_txt.value = format_advertisement(self.adv_data)
+
+    def update_adv_data(self, adv_data: AdvertisementData):
+        """Show a newer advertisement of the same device."""
+        self.update_rssi(adv_data)
+        if self.details_shown:
+            self.render_details()
+
+    def update_rssi(self, adv_data: AdvertisementData):
+        """Show a newer advertisement with unchanged content."""
+        self.adv_data = adv_data
+        if self.rssi_stats is None:
+            self.rssi_lbl.text = f"{adv_data.rssi} dBm"
+
+    def close(self):
+        if self.details_box is not None:
+            self.rssi_chart.close()
+
+    def show_rssi_stats(self, stats: RssiStats):
+        self.rssi_stats = stats
+        self.rssi_history.append(time.monotonic(), stats.smoothed)
+        if self.details_shown:
+            self.rssi_chart.schedule_redraw()
+        # Like the live updates, the label only follows bigger RSSI changes
+        if (
+            self.labelled_rssi is None
+            or abs(stats.smoothed - self.labelled_rssi) >= DEFAULT_RSSI_THRESHOLD
+        ):
+            self.labelled_rssi = stats.smoothed
+            self.rssi_lbl.text = str(stats)
+
 
 class ExceptionRow(CustomListRow):
     def __init__(self, ex: Exception):
@@ -151,13 +205,63 @@ class InfoRow(CustomListRow):
 
 
 class BLEScanResultsListView(CustomListView):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.device_rows: dict[str, BLEDeviceRow] = {}
+
+    def clear(self, close_rows: bool = True) -> None:
+        super().clear(close_rows)
+        self.device_rows = {}
+
     def append_device(
         self,
         device: BLEDevice,
         adv_data: AdvertisementData,
         on_connect: Callable[[BLEDevice, AdvertisementData], None],
     ):
-        self.add_row(BLEDeviceRow(device, adv_data, on_connect))
+        row = BLEDeviceRow(device, adv_data, on_connect)
+        self.device_rows[device.address] = row
+        self.add_row(row)
+
+    def show_devices(
+        self,
+        results: list[tuple[BLEDevice, AdvertisementData]],
+        on_connect: Callable[[BLEDevice, AdvertisementData], None],
+    ):
+        """Show exactly these devices in this order.
+
+        Rows of devices that are already shown are reused, including their
+        rendered details.
+        """
+        previous_rows = self.device_rows
+        # Only the device rows have something to close
+        self.clear(close_rows=False)
+        for device, adv_data in results:
+            row = previous_rows.get(device.address)
+            if row is None:
+                self.append_device(device, adv_data, on_connect)
+            else:
+                row.update_adv_data(adv_data)
+                self.device_rows[device.address] = row
+                self.add_row(row)
+        for address, row in previous_rows.items():
+            if address not in self.device_rows:
+                row.close()
+
+    def apply_updates(
+        self,
+        updates: list[tuple[BLEDevice, AdvertisementData, UpdateKind]],
+        on_connect: Callable[[BLEDevice, AdvertisementData], None],
+    ):
+        """Apply the live updates of the deduplication stage."""
+        for device, adv_data, kind in updates:
+            row = self.device_rows.get(device.address)
+            if row is None:
+                self.append_device(device, adv_data, on_connect)
+            elif kind is UpdateKind.RSSI:
+                row.update_rssi(adv_data)
+            else:
+                row.update_adv_data(adv_data)
 
     def append_exception(self, ex: Exception):
         self.add_row(ExceptionRow(ex))
@@ -182,10 +286,41 @@ class BLEScanBox(toga.Box):
             style=Pack(direction=COLUMN, flex=1),
             horizontal=False,
         )
+        self.dedup_stats_lbl = toga.Label("", style=Pack(margin_left=5))
+
+        monitor_box = toga.Box(style=Pack(direction=ROW, margin=5))
+        self.monitor_switch = toga.Switch(
+            "Monitor",
+            on_change=self.on_monitor_change,
+            style=Pack(flex=1),
+        )
+        self.scanning_mode_selection = toga.Selection(items=["active", "passive"])
+        monitor_box.add(self.monitor_switch)
+        monitor_box.add(self.scanning_mode_selection)
+        self.cycle_stats_lbl = toga.Label("", style=Pack(margin_left=5))
+
+        export_box = toga.Box(style=Pack(direction=ROW, margin=5))
+        self.export_switch = toga.Switch(
+            "Export",
+            on_change=self.on_export_change,
+            style=Pack(flex=1),
+        )
+        self.export_format_selection = toga.Selection(items=list(FORMATS))
+        export_box.add(self.export_switch)
+        export_box.add(self.export_format_selection)
+        self.export_lbl = toga.Label("", style=Pack(margin_left=5))
 
         self.scan_running = False
+        self.deduplicator = AdvertisementDeduplicator()
+        self.rssi_analytics = RssiAnalytics()
+        self.scan_scheduler: ScanScheduler | None = None
 
         self.add(self.scan_button)
+        self.add(monitor_box)
+        self.add(self.cycle_stats_lbl)
+        self.add(export_box)
+        self.add(self.export_lbl)
+        self.add(self.dedup_stats_lbl)
         self.add(self.scan_results_view)
 
     async def start_scan(self, widget: toga.Widget):
@@ -194,43 +329,198 @@ class BLEScanBox(toga.Box):
         The scan result in scanner.discovered_devices and
         scanner.discovered_devices_and_advertisement_data
         contains each discovered device only once.
+
+        The scan stops as soon as no new devices showed up for a second.
+
+        While scanning, the advertisements pass the deduplication stage and
+        only new devices, changed content and bigger RSSI changes reach the
+        list view.
         """
         if self.scan_running is True:
             return
 
+        self.scan_running = True
         self.scan_button.enabled = False
+        self.monitor_switch.enabled = False
         orig_btn_text = self.scan_button.text
         self.scan_button.text = "Scanning..."
-        self.scan_results_view.clear()
         # self.scan_results_view.append_info("Scanning...")
+        self.deduplicator.reset()
+        self.rssi_analytics.reset()
+        live_updates = BatchProcessor(
+            self.classify_advertisements, self.show_live_updates
+        )
+        analytics_task = self.start_analytics()
+        results = None
         try:
-            async with BleakScanner() as scanner:
-                await asyncio.sleep(2)
-                self.show_scan_results(
-                    scanner.discovered_devices_and_advertisement_data
+            async with BleakScanner(
+                detection_callback=self.make_detection_callback(live_updates)
+            ) as scanner:
+                results = await wait_until_settled(
+                    scanner, quiet_period=1.0, timeout=5.0
                 )
 
         except Exception as e:
             traceback.print_exc()
             self.scan_results_view.append_exception(e)
         finally:
+            analytics_task.cancel()
+            # The remaining live updates are shown before the final results
+            await live_updates.close()
+            self.update_analytics()
+            self.dedup_stats_lbl.text = str(self.deduplicator.stats)
             self.scan_button.enabled = True
             self.scan_button.text = orig_btn_text
+            self.monitor_switch.enabled = True
+            self.scan_running = False
+        if results is not None:
+            self.show_scan_results(results)
+
+    def make_detection_callback(
+        self, live_updates: BatchProcessor
+    ) -> Callable[[BLEDevice, AdvertisementData], None]:
+        def detection_callback(device: BLEDevice, adv_data: AdvertisementData):
+            exports.write_advertisement(device, adv_data)
+            self.rssi_analytics.add_sample(
+                device.address, adv_data.rssi, adv_data.tx_power
+            )
+            live_updates.submit((device, adv_data))
+
+        return detection_callback
+
+    async def classify_advertisements(
+        self, items: list[tuple[BLEDevice, AdvertisementData]]
+    ) -> list[tuple[BLEDevice, AdvertisementData, UpdateKind]]:
+        # The state of the deduplicator is only read and changed on the event
+        # loop, the pool only gets a snapshot of the devices in the batch.
+        deduplicator = self.deduplicator
+        result = await processing_pool.run_batch(
+            classify_batch,
+            items,
+            deduplicator.snapshot(items),
+            deduplicator.rssi_threshold,
+        )
+        return deduplicator.merge(result)
+
+    async def on_export_change(self, widget: toga.Switch):
+        """Export advertisements and notifications while the switch is on."""
+        if widget.value:
+            directory = self.main_window.app.paths.data / "exports"
+            exports.start(directory, self.export_format_selection.value)
+            self.export_format_selection.enabled = False
+            self.export_lbl.text = f"Exporting to {directory}"
+        else:
+            # The writers finish their last blocks in the background
+            widget.enabled = False
+            self.export_lbl.text = "Finishing export..."
+            try:
+                summary = await exports.stop_async()
+            finally:
+                widget.enabled = True
+            self.export_format_selection.enabled = True
+            self.export_lbl.text = f"Exported {summary}"
+
+    async def on_monitor_change(self, widget: toga.Switch):
+        if widget.value:
+            await self.monitor()
+        elif self.scan_scheduler is not None:
+            self.scan_scheduler.stop()
+
+    async def monitor(self):
+        """Scan in duty cycles until the monitor switch is turned off.
+
+        The pause between the cycles grows while no new devices show up.
+        """
+        if self.scan_running is True:
+            # Only one scanner at a time
+            self.monitor_switch.value = False
+            return
+
+        self.scan_running = True
+        self.scan_button.enabled = False
+        self.scanning_mode_selection.enabled = False
+        self.deduplicator.reset()
+        self.rssi_analytics.reset()
+        live_updates = BatchProcessor(
+            self.classify_advertisements, self.show_live_updates
+        )
+        self.scan_scheduler = ScanScheduler(
+            ScanSchedule(scanning_mode=self.scanning_mode_selection.value),
+            detection_callback=self.make_detection_callback(live_updates),
+            on_cycle=self.show_cycle_stats,
+        )
+        analytics_task = self.start_analytics()
+        try:
+            await self.scan_scheduler.run()
+        except Exception as e:
+            traceback.print_exc()
+            self.scan_results_view.append_exception(e)
+        finally:
+            self.scan_scheduler = None
+            analytics_task.cancel()
+            await live_updates.close()
+            self.update_analytics()
+            self.dedup_stats_lbl.text = str(self.deduplicator.stats)
+            self.monitor_switch.value = False
+            self.scanning_mode_selection.enabled = True
+            self.scan_button.enabled = True
+            self.scan_running = False
+
+    def show_cycle_stats(self, stats: CycleStats):
+        self.cycle_stats_lbl.text = str(stats)
+        if self.scan_scheduler is not None:
+            # Sort the list once per cycle instead of on every advertisement
+            self.show_scan_results(self.scan_scheduler.discovered)
+
+    def start_analytics(self) -> asyncio.Task:
+        return diagnostics.track_task(
+            asyncio.create_task(self.run_analytics()), "BLEScanBox.run_analytics"
+        )
+
+    async def run_analytics(self):
+        """Update the smoothed RSSI of all devices at 10 Hz."""
+        while True:
+            await asyncio.sleep(0.1)
+            self.update_analytics()
+
+    def update_analytics(self):
+        device_rows = self.scan_results_view.device_rows
+        for address, stats in self.rssi_analytics.update().items():
+            row = device_rows.get(address)
+            if row is not None:
+                row.show_rssi_stats(stats)
+
+    def show_live_updates(
+        self, updates: list[tuple[BLEDevice, AdvertisementData, UpdateKind]]
+    ):
+        self.scan_results_view.apply_updates(updates, self.show_device_data)
+        for device, _, kind in updates:
+            if kind is UpdateKind.NEW:
+                stats = self.rssi_analytics.stats(device.address)
+                row = self.scan_results_view.device_rows[device.address]
+                if stats is not None and row.rssi_stats is None:
+                    row.show_rssi_stats(stats)
+        self.dedup_stats_lbl.text = str(self.deduplicator.stats)
 
     def show_scan_results(self, data: dict[str, tuple[BLEDevice, AdvertisementData]]):
         """Show names of found devices and attached advertisment data.
 
         'data' is a dictionary, where the keys are the BLE addresses
         and the values are tuples of BLE device, advertisement data.
+
+        Devices are sorted by their smoothed RSSI.
         """
-        self.scan_results_view.clear()
+
+        def rssi(value: tuple[BLEDevice, AdvertisementData]) -> float:
+            smoothed = self.rssi_analytics.smoothed(value[0].address)
+            return value[1].rssi if smoothed is None else smoothed
+
         values = list(data.values())
-        values = sorted(values, key=lambda value: value[1].rssi, reverse=True)
-        for value in values:
-            device, adv_data = value
-            self.scan_results_view.append_device(
-                device, adv_data, self.show_device_data
-            )
+        values = sorted(values, key=rssi, reverse=True)
+        self.scan_results_view.show_devices(values, self.show_device_data)
 
     def show_device_data(self, device: BLEDevice, adv_data: AdvertisementData):
+        if self.scan_scheduler is not None:
+            self.scan_scheduler.stop()
         self.main_window.content = BLEDeviceBox(self.main_window, self, device)
+        diagnostics.screen_shown("device")
@@ -0,0 +1,104 @@
+"""
+Time series charts for long sessions.
+
+The samples are stored in a MinMaxPyramid and every redraw only draws the
+min/max envelope of at most one bucket per pixel column, so the redraw cost
+doesn't grow with the length of the session.
+"""
+
+import asyncio
+import time
+
+import toga
+from toga.style import Pack
+
+from bleakbleexplorer.downsample import MinMaxPyramid
+
+# Minimum time between two redraws
+REDRAW_INTERVAL = 0.5
+
+
+class TimeSeriesChart(toga.Canvas):
+    def __init__(
+        self,
+        series: MinMaxPyramid | None = None,
+        time_window: float | None = None,
+        max_buckets: int = 300,
+        color: str = "#1f77b4",
+        style: Pack | None = None,
+    ):
+        """Chart of 'series', which can be filled before the chart exists.
+
+        'time_window' is the shown time range in seconds (None for all samples).
+        """
+        super().__init__(
+            style=style or Pack(height=100, flex=1),
+            on_resize=self.on_resize_chart,
+        )
+        # Not 'window', that is the toga window of the widget
+        self.time_window = time_window
+        self.max_buckets = max_buckets
+        self.color = color
+        self.series = MinMaxPyramid() if series is None else series
+        self.chart_width = 300
+        self.chart_height = 100
+        self._redraw_handle: asyncio.TimerHandle | None = None
+
+    def append(self, value: float, timestamp: float | None = None):
+        self.series.append(time.monotonic() if timestamp is None else timestamp, value)
+        self.schedule_redraw()
+
+    def schedule_redraw(self):
+        """Redraw at most every REDRAW_INTERVAL seconds."""
+        if self._redraw_handle is None:
+            self._redraw_handle = asyncio.get_running_loop().call_later(
+                REDRAW_INTERVAL, self.redraw_chart
+            )
+
+    def on_resize_chart(self, widget: toga.Canvas, width: int, height: int, **kwargs):
+        self.chart_width = width
+        self.chart_height = height
+        self.redraw_chart()
+
+    def redraw_chart(self):
+        self._redraw_handle = None
+        # Toga >= 0.5.4 draws with methods of the canvas instead of the state
+        canvas_api = hasattr(self, "root_state")
+        if canvas_api:
+            self.root_state.drawing_actions.clear()
+            self.redraw()
+        else:
+            self.context.clear()
+        if len(self.series) == 0 or self.chart_width <= 0 or self.chart_height <= 0:
+            return
+
+        last = self.series.last_time
+        start = None if self.time_window is None else last - self.time_window
+        envelope = self.series.envelope(
+            max_buckets=min(self.max_buckets, int(self.chart_width)), start=start
+        )
+        first = envelope.times[0] if start is None else start
+        low = envelope.minima.min()
+        high = envelope.maxima.max()
+        x_scale = (self.chart_width - 1) / max(last - first, 1e-9)
+        y_scale = (self.chart_height - 1) / max(high - low, 1e-9)
+        xs = ((envelope.times - first) * x_scale).tolist()
+        y_minima = ((high - envelope.minima) * y_scale).tolist()
+        y_maxima = ((high - envelope.maxima) * y_scale).tolist()
+
+        if canvas_api:
+            stroke_context = self.stroke(color=self.color, line_width=1)
+        else:
+            stroke_context = self.Stroke(color=self.color, line_width=1)
+        with stroke_context as stroke:
+            path = self if canvas_api else stroke
+            path.move_to(xs[0], y_minima[0])
+            for x, y_min, y_max in zip(xs, y_minima, y_maxima):
+                path.line_to(x, y_min)
+                path.line_to(x, y_max)
+
+    def close(self):
+        """Cancel a scheduled redraw."""
+        if self._redraw_handle is not None:
+            self._redraw_handle.cancel()
+            self._redraw_handle = None
@@ -2,21 +2,35 @@ import toga
 from toga.style import Pack
 from toga.style.pack import COLUMN, ROW
 
+from bleakbleexplorer.diagnostics import diagnostics
+
 
 class CustomListView(toga.ScrollContainer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.container = toga.Box(style=Pack(direction=COLUMN, flex=1))
         self.content = self.container
+        self.rows: list[CustomListRow] = []
+        diagnostics.register_list_view(self)
 
-    def clear(self) -> None:
+    def clear(self, close_rows: bool = True) -> None:
+        """Remove all rows and close them, unless they are reused."""
+        if close_rows:
+            for row in self.rows:
+                row.close()
         self.container.clear()
+        self.rows.clear()
 
     def add_row(self, row: "CustomListRow"):
         self.container.add(row)
         self.container.add(toga.Divider())
+        self.rows.append(row)
 
 
 class CustomListRow(toga.Box):
     def __init__(self):
         super().__init__(style=Pack(direction=ROW, margin=5))
+        diagnostics.register_row(self)
+
+    def close(self):
+        """Release what the row started (timers, charts, ...)."""
@@ -0,0 +1,176 @@
+"""
+Deduplication of repeated advertisements.
+
+Most devices send the same payload over and over again and only the RSSI
+changes. The AdvertisementDeduplicator hashes the content of every
+advertisement and tells the scan pipeline if a full row update is needed,
+if only the RSSI has to be updated or if the advertisement can be dropped.
+"""
+
+import dataclasses
+import enum
+from typing import NamedTuple
+
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+from bleakbleexplorer.formatting import advertisement_content_key
+
+# RSSI changes smaller than this (in dB) are not shown
+DEFAULT_RSSI_THRESHOLD = 3
+
+
+class UpdateKind(enum.Enum):
+    # First advertisement of the device
+    NEW = enum.auto()
+    # The content (name, manufacturer/service data, ...) changed
+    CONTENT = enum.auto()
+    # Same content, but the RSSI changed by at least the threshold
+    RSSI = enum.auto()
+    # Nothing to show
+    SUPPRESSED = enum.auto()
+
+
+def content_hash(adv_data: AdvertisementData) -> int:
+    return hash(advertisement_content_key(adv_data))
+
+
+@dataclasses.dataclass
+class DedupStats:
+    new: int = 0
+    content_updates: int = 0
+    rssi_updates: int = 0
+    suppressed: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.new + self.content_updates + self.rssi_updates + self.suppressed
+
+    def count(self, kind: UpdateKind):
+        if kind is UpdateKind.NEW:
+            self.new += 1
+        elif kind is UpdateKind.CONTENT:
+            self.content_updates += 1
+        elif kind is UpdateKind.RSSI:
+            self.rssi_updates += 1
+        else:
+            self.suppressed += 1
+
+    def add(self, other: "DedupStats"):
+        for field in dataclasses.fields(self):
+            setattr(
+                self, field.name, getattr(self, field.name) + getattr(other, field.name)
+            )
+
+    def __str__(self) -> str:
+        return (
+            f"{self.total} advertisements: {self.new} new, "
+            f"{self.content_updates} changed, {self.rssi_updates} RSSI only, "
+            f"{self.suppressed} suppressed"
+        )
+
+
+def classify_update(
+    last: tuple[int, int] | None, digest: int, rssi: int, rssi_threshold: int
+) -> UpdateKind:
+    """Kind of update for an advertisement, given the last shown (hash, RSSI)."""
+    if last is None:
+        return UpdateKind.NEW
+    if last[0] != digest:
+        return UpdateKind.CONTENT
+    if abs(rssi - last[1]) >= rssi_threshold:
+        return UpdateKind.RSSI
+    return UpdateKind.SUPPRESSED
+
+
+class DedupResult(NamedTuple):
+    # At most one update per device, suppressed advertisements are dropped
+    updates: list[tuple[BLEDevice, AdvertisementData, UpdateKind]]
+    # Address -> (content hash, RSSI) that is shown after the updates
+    shown: dict[str, tuple[int, int]]
+    stats: DedupStats
+
+
+def classify_batch(
+    items: list[tuple[BLEDevice, AdvertisementData]],
+    last_shown: dict[str, tuple[int, int]],
+    rssi_threshold: int = DEFAULT_RSSI_THRESHOLD,
+) -> DedupResult:
+    """Classify a batch of advertisements against 'last_shown'.
+
+    Doesn't change any state, so it can run on the worker pool while the
+    event loop keeps using the deduplicator. Several updates of the same
+    device are merged into one with the latest advertisement, so every row
+    is updated at most once per batch.
+    """
+    shown: dict[str, tuple[int, int]] = {}
+    stats = DedupStats()
+    updates: dict[str, tuple[BLEDevice, AdvertisementData, UpdateKind]] = {}
+    for device, adv_data in items:
+        address = device.address
+        digest = content_hash(adv_data)
+        last = shown.get(address, last_shown.get(address))
+        kind = classify_update(last, digest, adv_data.rssi, rssi_threshold)
+        stats.count(kind)
+        if kind is UpdateKind.SUPPRESSED:
+            continue
+        shown[address] = (digest, adv_data.rssi)
+        previous = updates.get(address)
+        if previous is not None and previous[2].value < kind.value:
+            # Keep the more important kind (NEW < CONTENT < RSSI)
+            kind = previous[2]
+        updates[address] = (device, adv_data, kind)
+    return DedupResult(list(updates.values()), shown, stats)
+
+
+class AdvertisementDeduplicator:
+    """State of the deduplication stage. Only used on the event loop."""
+
+    def __init__(self, rssi_threshold: int = DEFAULT_RSSI_THRESHOLD):
+        self.rssi_threshold = rssi_threshold
+        # Address -> (content hash, last shown RSSI)
+        self.last_shown: dict[str, tuple[int, int]] = {}
+        self.stats = DedupStats()
+
+    def reset(self):
+        self.last_shown.clear()
+        self.stats = DedupStats()
+
+    def classify(self, device: BLEDevice, adv_data: AdvertisementData) -> UpdateKind:
+        digest = content_hash(adv_data)
+        kind = classify_update(
+            self.last_shown.get(device.address),
+            digest,
+            adv_data.rssi,
+            self.rssi_threshold,
+        )
+        self.stats.count(kind)
+        if kind is not UpdateKind.SUPPRESSED:
+            self.last_shown[device.address] = (digest, adv_data.rssi)
+        return kind
+
+    def snapshot(
+        self, items: list[tuple[BLEDevice, AdvertisementData]]
+    ) -> dict[str, tuple[int, int]]:
+        """The last shown state of the devices in 'items' for classify_batch."""
+        return {
+            device.address: self.last_shown[device.address]
+            for device, _ in items
+            if device.address in self.last_shown
+        }
+
+    def merge(
+        self, result: DedupResult
+    ) -> list[tuple[BLEDevice, AdvertisementData, UpdateKind]]:
+        """Apply the result of classify_batch and return its updates."""
+        self.last_shown.update(result.shown)
+        self.stats.add(result.stats)
+        return result.updates
+
+    def process_batch(
+        self, items: list[tuple[BLEDevice, AdvertisementData]]
+    ) -> list[tuple[BLEDevice, AdvertisementData, UpdateKind]]:
+        """Classify a batch of advertisements on the event loop."""
+        return self.merge(
+            classify_batch(items, self.snapshot(items), self.rssi_threshold)
+        )
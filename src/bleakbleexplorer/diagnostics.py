@@ -0,0 +1,197 @@
+"""
+Diagnostics for long running sessions.
+
+Tracks the live widgets of every CustomListView, the rows that are still
+alive, tracemalloc snapshots per screen and outstanding asyncio tasks.
+`repeat_leak_check` repeats an action and reports what was not released.
+"""
+
+import asyncio
+import dataclasses
+import gc
+import inspect
+import os
+import tracemalloc
+import weakref
+from collections import Counter
+from typing import Any, Awaitable, Callable
+
+import toga
+
+
+def count_widgets(widget: toga.Widget) -> int:
+    """Number of widgets in the tree below (and including) 'widget'."""
+    count = 1
+    for child in widget.children:
+        count += count_widgets(child)
+    if isinstance(widget, toga.ScrollContainer) and widget.content is not None:
+        count += count_widgets(widget.content)
+    return count
+
+
+class Diagnostics:
+    def __init__(self):
+        self.list_views: weakref.WeakSet[toga.Widget] = weakref.WeakSet()
+        self.rows: weakref.WeakSet[toga.Widget] = weakref.WeakSet()
+        self.tasks: weakref.WeakKeyDictionary[asyncio.Task, str] = (
+            weakref.WeakKeyDictionary()
+        )
+        self.snapshots: dict[str, tracemalloc.Snapshot] = {}
+        self.current_screen: str | None = None
+
+    def register_list_view(self, view: toga.Widget):
+        self.list_views.add(view)
+
+    def register_row(self, row: toga.Widget):
+        self.rows.add(row)
+
+    def track_task(self, task: asyncio.Task, owner: str) -> asyncio.Task:
+        self.tasks[task] = owner
+        return task
+
+    def screen_shown(self, screen: str):
+        """Called whenever the main window shows another screen."""
+        self.current_screen = screen
+        if tracemalloc.is_tracing():
+            self.snapshots[screen] = tracemalloc.take_snapshot()
+
+    def start_tracemalloc(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def list_view_stats(self) -> dict[str, dict[str, int]]:
+        return {
+            f"{type(view).__name__}@{id(view):x}": {
+                "rows": len(view.rows),
+                "widgets": count_widgets(view),
+            }
+            for view in list(self.list_views)
+        }
+
+    def live_rows(self) -> Counter[str]:
+        return Counter(type(row).__name__ for row in list(self.rows))
+
+    def outstanding_tasks(self) -> Counter[str]:
+        return Counter(
+            owner for task, owner in list(self.tasks.items()) if not task.done()
+        )
+
+    def memory_diff(self, screen: str, limit: int = 10) -> list[str]:
+        """Biggest allocation differences since 'screen' was last shown."""
+        if not tracemalloc.is_tracing() or screen not in self.snapshots:
+            return []
+        stats = tracemalloc.take_snapshot().compare_to(self.snapshots[screen], "lineno")
+        return [str(stat) for stat in stats[:limit]]
+
+    def report(self) -> dict[str, Any]:
+        report: dict[str, Any] = {
+            "screen": self.current_screen,
+            "list_views": self.list_view_stats(),
+            "live_rows": dict(self.live_rows()),
+            "outstanding_tasks": dict(self.outstanding_tasks()),
+        }
+        try:
+            report["all_asyncio_tasks"] = len(asyncio.all_tasks())
+        except RuntimeError:
+            # No running event loop
+            pass
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["traced_memory"] = {"current": current, "peak": peak}
+        return report
+
+    def format_report(self, limit: int = 10) -> str:
+        """The report and the memory growth on the current screen as text."""
+        lines = []
+        for key, value in self.report().items():
+            if isinstance(value, dict) and value:
+                lines.append(f"{key}:")
+                lines.extend(f"  {name}: {item}" for name, item in value.items())
+            else:
+                lines.append(f"{key}: {value}")
+        if not tracemalloc.is_tracing():
+            lines.append("Set BLEAK_EXPLORER_TRACEMALLOC=1 to trace the memory")
+        elif self.current_screen is not None:
+            lines.append(f"Memory growth since the {self.current_screen} screen:")
+            lines.extend(
+                f"  {line}" for line in self.memory_diff(self.current_screen, limit)
+            )
+        return "\n".join(lines)
+
+
+diagnostics = Diagnostics()
+
+if os.environ.get("BLEAK_EXPLORER_TRACEMALLOC"):
+    diagnostics.start_tracemalloc()
+
+
+@dataclasses.dataclass
+class LeakReport:
+    repetitions: int
+    # Growth between the baseline and the end of the check
+    rows: Counter[str]
+    tasks: Counter[str]
+    list_view_widgets: int
+    memory_bytes: int
+
+    @property
+    def memory_bytes_per_repetition(self) -> float:
+        return self.memory_bytes / self.repetitions
+
+    def assert_no_leaks(self, max_bytes_per_repetition: float = 4096):
+        assert not self.rows, f"Rows are not released: {dict(self.rows)}"
+        assert not self.tasks, f"Tasks are still running: {dict(self.tasks)}"
+        assert self.list_view_widgets <= 0, (
+            f"{self.list_view_widgets} widgets more in list views"
+        )
+        assert self.memory_bytes_per_repetition <= max_bytes_per_repetition, (
+            f"Memory grows by {self.memory_bytes_per_repetition:.0f} bytes per repetition"
+        )
+
+
+def _measure() -> tuple[Counter[str], Counter[str], int, int]:
+    gc.collect()
+    widgets = sum(stats["widgets"] for stats in diagnostics.list_view_stats().values())
+    memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    return diagnostics.live_rows(), diagnostics.outstanding_tasks(), widgets, memory
+
+
+async def repeat_leak_check(
+    action: Callable[[], Awaitable[None] | None],
+    repetitions: int = 20,
+    warmup: int = 2,
+) -> LeakReport:
+    """Run 'action' repeatedly and report what it leaves behind.
+
+    The warmup runs fill caches, so that only the growth caused by the
+    repetitions afterwards is reported.
+    """
+
+    async def run():
+        result = action()
+        if inspect.isawaitable(result):
+            await result
+        # Give cancelled tasks the chance to finish
+        await asyncio.sleep(0)
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        for _ in range(warmup):
+            await run()
+        rows, tasks, widgets, memory = _measure()
+        for _ in range(repetitions):
+            await run()
+        rows_after, tasks_after, widgets_after, memory_after = _measure()
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    return LeakReport(
+        repetitions=repetitions,
+        rows=rows_after - rows,
+        tasks=tasks_after - tasks,
+        list_view_widgets=widgets_after - widgets,
+        memory_bytes=memory_after - memory,
+    )
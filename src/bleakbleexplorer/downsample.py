@@ -0,0 +1,164 @@
+"""
+Level-of-detail storage for long time series.
+
+A MinMaxPyramid keeps the samples and additionally min/max buckets on
+several levels, where each bucket of a level combines FANOUT buckets of the
+level below. The levels are updated incrementally on every sample. To draw
+a time range, the coarsest level that still has enough buckets in that
+range is used, so a redraw touches at most a few hundred buckets no matter
+how long the session is.
+
+Every level keeps at most 'max_buckets' buckets and drops its oldest half
+when it is full, so the memory is bounded too. Old time ranges are still
+covered by the coarser levels.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+# Buckets of a level that are combined into one bucket of the next level
+FANOUT = 4
+# Buckets kept per level, about 27 minutes of samples at 10 Hz on level 0
+MAX_BUCKETS = 16384
+
+
+class Level:
+    """Min/max buckets of one level in growable arrays."""
+
+    def __init__(self, capacity: int = 64, max_buckets: int = MAX_BUCKETS):
+        # Buckets appended so far, including the dropped ones
+        self.count = 0
+        self.dropped = 0
+        self.max_buckets = max(max_buckets, 2 * FANOUT)
+        # Time of the first sample in the bucket
+        self.times = np.zeros(min(capacity, self.max_buckets))
+        self.minima = np.zeros(len(self.times))
+        self.maxima = np.zeros(len(self.times))
+
+    @property
+    def stored(self) -> int:
+        """Number of buckets in the arrays."""
+        return self.count - self.dropped
+
+    def append(self, time: float, minimum: float, maximum: float):
+        stored = self.stored
+        if stored == self.max_buckets:
+            # Drop the oldest half
+            drop = stored // 2
+            for array in (self.times, self.minima, self.maxima):
+                array[: stored - drop] = array[drop:stored]
+            self.dropped += drop
+            stored -= drop
+        elif stored == len(self.times):
+            capacity = min(2 * len(self.times), self.max_buckets)
+            for name in ("times", "minima", "maxima"):
+                array = getattr(self, name)
+                grown = np.zeros(capacity)
+                grown[:stored] = array
+                setattr(self, name, grown)
+        self.times[stored] = time
+        self.minima[stored] = minimum
+        self.maxima[stored] = maximum
+        self.count += 1
+
+
+class Envelope(NamedTuple):
+    """Min/max buckets to draw, ordered by time."""
+
+    times: np.ndarray
+    minima: np.ndarray
+    maxima: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+class MinMaxPyramid:
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self.levels: list[Level] = [Level(max_buckets=max_buckets)]
+
+    def __len__(self) -> int:
+        """Number of samples, including the dropped ones."""
+        return self.levels[0].count
+
+    @property
+    def last_time(self) -> float | None:
+        level = self.levels[0]
+        return float(level.times[level.stored - 1]) if level.stored else None
+
+    def append(self, time: float, value: float):
+        self.levels[0].append(time, value, value)
+        level = 0
+        # Combine the last FANOUT buckets, once they are complete
+        while self.levels[level].count % FANOUT == 0:
+            below = self.levels[level]
+            if level + 1 == len(self.levels):
+                self.levels.append(Level(max_buckets=self.max_buckets))
+            start = below.stored - FANOUT
+            self.levels[level + 1].append(
+                below.times[start],
+                below.minima[start : below.stored].min(),
+                below.maxima[start : below.stored].max(),
+            )
+            level += 1
+
+    def _covers(self, level: int, start: float | None) -> bool:
+        """Whether 'level' still has the buckets from 'start' on."""
+        buckets = self.levels[level]
+        if buckets.dropped == 0:
+            return True
+        return start is not None and buckets.times[0] <= start
+
+    def _slice(self, level: int, start: float | None, end: float | None) -> slice:
+        times = self.levels[level].times[: self.levels[level].stored]
+        first = 0 if start is None else max(np.searchsorted(times, start) - 1, 0)
+        last = len(times) if end is None else np.searchsorted(times, end, "right")
+        return slice(int(first), int(last))
+
+    def envelope(
+        self,
+        max_buckets: int = 300,
+        start: float | None = None,
+        end: float | None = None,
+    ) -> Envelope:
+        """At most about 'max_buckets' buckets covering 'start' to 'end'.
+
+        The samples at the end that are not combined into a bucket of the
+        chosen level yet are added from the finer levels.
+        """
+        level = 0
+        for candidate in range(len(self.levels)):
+            level = candidate
+            if not self._covers(candidate, start):
+                continue
+            selection = self._slice(candidate, start, end)
+            if selection.stop - selection.start <= max_buckets:
+                break
+
+        selection = self._slice(level, start, end)
+        parts = [self._buckets(level, selection.start, selection.stop)]
+        # Newest samples that are only on the finer levels
+        for finer in range(level - 1, -1, -1):
+            buckets = self.levels[finer]
+            count = buckets.count
+            tail = self._buckets(
+                finer, count // FANOUT * FANOUT - buckets.dropped, buckets.stored
+            )
+            keep = np.ones(len(tail), dtype=bool)
+            if start is not None:
+                keep &= tail.times >= start
+            if end is not None:
+                keep &= tail.times <= end
+            parts.append(Envelope(*(array[keep] for array in tail)))
+        return Envelope(*(np.concatenate(arrays) for arrays in zip(*parts)))
+
+    def _buckets(self, level: int, first: int, last: int) -> Envelope:
+        """Buckets 'first' to 'last' of the arrays of 'level'."""
+        buckets = self.levels[level]
+        return Envelope(
+            buckets.times[first:last],
+            buckets.minima[first:last],
+            buckets.maxima[first:last],
+        )
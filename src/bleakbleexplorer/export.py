@@ -0,0 +1,495 @@
+"""
+Streaming export of advertisements and notifications.
+
+Records are handed over to a background writer thread, which encodes them
+in blocks and appends them to the current file of the stream. Files are
+rotated when they reach 'max_file_size', and the number of records waiting
+for the writer is bounded, so long captures neither block the UI loop nor
+pile up in memory.
+
+Supported formats:
+
+- "csv": one row per record with a header line.
+- "jsonl": one JSON object per line.
+- "columnar": compact binary format, see ColumnarFormat.
+"""
+
+import asyncio
+import csv
+import dataclasses
+import io
+import json
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+# Column kinds
+FLOAT = "float"
+INT = "int"
+STR = "str"
+BYTES = "bytes"
+
+# Missing values of INT columns in the columnar format
+INT_NULL = -(2**63)
+
+
+@dataclasses.dataclass(frozen=True)
+class Column:
+    name: str
+    kind: str
+
+
+ADVERTISEMENT_COLUMNS = (
+    Column("timestamp", FLOAT),
+    Column("address", STR),
+    Column("name", STR),
+    Column("rssi", INT),
+    Column("tx_power", INT),
+    Column("manufacturer_data", STR),
+    Column("service_data", STR),
+    Column("service_uuids", STR),
+)
+
+NOTIFICATION_COLUMNS = (
+    Column("timestamp", FLOAT),
+    Column("address", STR),
+    Column("characteristic", STR),
+    Column("handle", INT),
+    Column("value", BYTES),
+)
+
+
+def advertisement_record(
+    device: BLEDevice, adv_data: AdvertisementData, timestamp: float
+) -> tuple:
+    return (
+        timestamp,
+        device.address,
+        adv_data.local_name or device.name or "",
+        adv_data.rssi,
+        adv_data.tx_power,
+        " ".join(
+            f"{company_id:04X}:{data.hex()}"
+            for company_id, data in adv_data.manufacturer_data.items()
+        ),
+        " ".join(
+            f"{uuid}:{data.hex()}" for uuid, data in adv_data.service_data.items()
+        ),
+        " ".join(adv_data.service_uuids),
+    )
+
+
+def notification_record(
+    address: str,
+    characteristic: BleakGATTCharacteristic,
+    data: bytes | bytearray,
+    timestamp: float,
+) -> tuple:
+    return (timestamp, address, characteristic.uuid, characteristic.handle, bytes(data))
+
+
+class CSVFormat:
+    extension = "csv"
+
+    def header(self, columns: tuple[Column, ...]) -> bytes:
+        return self.encode(columns, [tuple(column.name for column in columns)])
+
+    def encode(self, columns: tuple[Column, ...], rows: list[tuple]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(
+                value.hex() if isinstance(value, bytes) else value for value in row
+            )
+        return buffer.getvalue().encode()
+
+
+class JSONLinesFormat:
+    extension = "jsonl"
+
+    def header(self, columns: tuple[Column, ...]) -> bytes:
+        return b""
+
+    def encode(self, columns: tuple[Column, ...], rows: list[tuple]) -> bytes:
+        names = [column.name for column in columns]
+        return "".join(
+            json.dumps(
+                {
+                    name: value.hex() if isinstance(value, bytes) else value
+                    for name, value in zip(names, row)
+                },
+                separators=(",", ":"),
+            )
+            + "\n"
+            for row in rows
+        ).encode()
+
+
+class ColumnarFormat:
+    """Compact binary format, where every block stores its data by column.
+
+    The file starts with MAGIC, followed by the length (uint32) and the JSON
+    of the column list. Each block is the number of rows (uint32) followed by
+    every column as its length in bytes (uint32) and its data:
+
+    - FLOAT: float64 values
+    - INT: int64 values, INT_NULL for missing values
+    - STR, BYTES: uint32 end offsets of the values, then the concatenated
+      (UTF-8 encoded) values
+
+    All numbers are little-endian.
+    """
+
+    extension = "blec"
+    MAGIC = b"BLEC\x01"
+
+    def header(self, columns: tuple[Column, ...]) -> bytes:
+        schema = json.dumps([dataclasses.asdict(column) for column in columns]).encode()
+        return self.MAGIC + struct.pack("<I", len(schema)) + schema
+
+    def encode(self, columns: tuple[Column, ...], rows: list[tuple]) -> bytes:
+        parts = [struct.pack("<I", len(rows))]
+        for index, column in enumerate(columns):
+            values = [row[index] for row in rows]
+            if column.kind == FLOAT:
+                data = _to_little_endian(array("d", values))
+            elif column.kind == INT:
+                data = _to_little_endian(
+                    array(
+                        "q", (INT_NULL if value is None else value for value in values)
+                    )
+                )
+            else:
+                if column.kind == STR:
+                    values = [value.encode() for value in values]
+                offsets = array("I")
+                end = 0
+                for value in values:
+                    end += len(value)
+                    offsets.append(end)
+                data = _to_little_endian(offsets) + b"".join(values)
+            parts.append(struct.pack("<I", len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+
+def _to_little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def read_columnar(file: BinaryIO) -> Iterator[dict[str, list[Any]]]:
+    """Read the blocks of a columnar file as dictionaries of columns."""
+    if file.read(len(ColumnarFormat.MAGIC)) != ColumnarFormat.MAGIC:
+        raise ValueError("Not a columnar export file")
+    (length,) = struct.unpack("<I", file.read(4))
+    columns = [Column(**column) for column in json.loads(file.read(length))]
+    while header := file.read(4):
+        (count,) = struct.unpack("<I", header)
+        block: dict[str, list[Any]] = {}
+        for column in columns:
+            (length,) = struct.unpack("<I", file.read(4))
+            data = file.read(length)
+            if column.kind in (FLOAT, INT):
+                values = array("d" if column.kind == FLOAT else "q")
+                values.frombytes(data)
+                if sys.byteorder == "big":
+                    values.byteswap()
+                block[column.name] = [
+                    None if column.kind == INT and value == INT_NULL else value
+                    for value in values
+                ]
+            else:
+                offsets = array("I")
+                offsets.frombytes(data[: 4 * count])
+                if sys.byteorder == "big":
+                    offsets.byteswap()
+                payload = data[4 * count :]
+                start = 0
+                column_values = []
+                for end in offsets:
+                    value = payload[start:end]
+                    column_values.append(
+                        value.decode() if column.kind == STR else value
+                    )
+                    start = end
+                block[column.name] = column_values
+        yield block
+
+
+FORMATS = {
+    "csv": CSVFormat(),
+    "jsonl": JSONLinesFormat(),
+    "columnar": ColumnarFormat(),
+}
+
+
+@dataclasses.dataclass
+class ExportStats:
+    records: int = 0
+    bytes: int = 0
+    files: int = 0
+    # Records dropped, because the writer couldn't keep up or failed
+    dropped: int = 0
+    # Error that stopped the writer
+    error: str = ""
+
+    def __str__(self) -> str:
+        text = (
+            f"{self.records} records, {self.bytes / 1e6:.1f} MB in {self.files} files"
+        )
+        if self.dropped:
+            text += f", {self.dropped} dropped"
+        if self.error:
+            text += f", failed: {self.error}"
+        return text
+
+
+class StreamExporter:
+    """Writes the records of one stream on a background thread."""
+
+    def __init__(
+        self,
+        directory: Path,
+        stream: str,
+        columns: tuple[Column, ...],
+        format: str = "jsonl",
+        max_file_size: int = 64 * 1024 * 1024,
+        flush_interval: float = 1.0,
+        block_size: int = 1000,
+        max_pending: int = 100_000,
+    ):
+        self.directory = directory
+        self.stream = stream
+        self.columns = columns
+        self.format = FORMATS[format]
+        self.max_file_size = max_file_size
+        self.flush_interval = flush_interval
+        # The writer wakes up early when this many records are queued
+        self.block_size = block_size
+        self.stats = ExportStats()
+        self.paths: list[Path] = []
+
+        self._pending: deque[tuple] = deque(maxlen=max_pending)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._flush_requested = False
+        # The writer has taken records from the queue, but not written them yet
+        self._writing = False
+        self._file: BinaryIO | None = None
+        self._file_size = 0
+        self._file_index = 0
+        # Exception that stopped the writer thread
+        self.error: Exception | None = None
+        self._started = time.strftime("%Y%m%d-%H%M%S")
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name=f"bleakbleexplorer-export-{stream}", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, record: tuple):
+        """Queue 'record' for writing. Never blocks.
+
+        Raises ValueError if the exporter is closed.
+        """
+        with self._condition:
+            if self._closed:
+                raise ValueError(f"Export of {self.stream} is closed")
+            if self.error is not None:
+                self.stats.dropped += 1
+                return
+            if len(self._pending) == self._pending.maxlen:
+                # The oldest record is replaced
+                self.stats.dropped += 1
+            self._pending.append(record)
+            if len(self._pending) >= self.block_size:
+                self._condition.notify_all()
+
+    def flush(self):
+        """Block until all queued records are written."""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while (self._pending or self._writing) and self._thread.is_alive():
+                self._condition.wait(self.flush_interval)
+
+    def close(self, wait: bool = True):
+        """Write all queued records and close the file.
+
+        With 'wait=False' the writer is only told to stop, join() waits
+        for it.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            self.join()
+
+    def join(self):
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    if (
+                        not self._closed
+                        and not self._flush_requested
+                        and len(self._pending) < self.block_size
+                    ):
+                        self._condition.wait(self.flush_interval)
+                    rows = list(self._pending)
+                    self._pending.clear()
+                    self._writing = bool(rows)
+                    self._flush_requested = False
+                    closed = self._closed
+                if rows:
+                    try:
+                        self._write_block(rows)
+                    finally:
+                        with self._condition:
+                            self._writing = False
+                            self._condition.notify_all()
+                if closed:
+                    break
+        except Exception as exc:
+            # Reported in the stats, the records written after it are dropped
+            with self._condition:
+                self.error = exc
+                self.stats.error = f"{type(exc).__name__}: {exc}"
+                self.stats.dropped += len(self._pending)
+                self._pending.clear()
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open_next_file(self):
+        if self._file is not None:
+            self._file.close()
+        while True:
+            path = self.directory / (
+                f"{self.stream}-{self._started}-{self._file_index:04d}"
+                f".{self.format.extension}"
+            )
+            self._file_index += 1
+            try:
+                # Never overwrite the files of an earlier export in the same second
+                self._file = open(path, "xb")
+            except FileExistsError:
+                continue
+            break
+        self.paths.append(path)
+        header = self.format.header(self.columns)
+        self._file.write(header)
+        self._file_size = len(header)
+        self.stats.files += 1
+        self.stats.bytes += len(header)
+
+    def _write_block(self, rows: list[tuple]):
+        if self._file is None or self._file_size >= self.max_file_size:
+            self._open_next_file()
+        data = self.format.encode(self.columns, rows)
+        self._file.write(data)
+        self._file.flush()
+        self._file_size += len(data)
+        self.stats.records += len(rows)
+        self.stats.bytes += len(data)
+
+
+class ExportManager:
+    """Exporters of the advertisement and notification streams.
+
+    Writing is a no-op while no export is running.
+    """
+
+    def __init__(self):
+        self.advertisements: StreamExporter | None = None
+        self.notifications: StreamExporter | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.advertisements is not None
+
+    def start(self, directory: Path, format: str = "jsonl", **kwargs):
+        self.stop()
+        self.advertisements = StreamExporter(
+            directory, "advertisements", ADVERTISEMENT_COLUMNS, format, **kwargs
+        )
+        self.notifications = StreamExporter(
+            directory, "notifications", NOTIFICATION_COLUMNS, format, **kwargs
+        )
+
+    def stop(self) -> str:
+        """Stop the export and return a summary of what was written."""
+        exporters = self._detach()
+        for exporter in exporters:
+            exporter.close()
+        return export_summary(*exporters)
+
+    async def stop_async(self) -> str:
+        """Like stop(), but waits for the writers without blocking the loop.
+
+        Records written after the call are ignored.
+        """
+        exporters = self._detach()
+        for exporter in exporters:
+            exporter.close(wait=False)
+        for exporter in exporters:
+            await asyncio.to_thread(exporter.join)
+        return export_summary(*exporters)
+
+    def _detach(self) -> tuple[StreamExporter, StreamExporter] | tuple[()]:
+        if self.advertisements is None or self.notifications is None:
+            return ()
+        exporters = (self.advertisements, self.notifications)
+        self.advertisements = None
+        self.notifications = None
+        return exporters
+
+    def write_advertisement(self, device: BLEDevice, adv_data: AdvertisementData):
+        if self.advertisements is not None:
+            self.advertisements.write(
+                advertisement_record(device, adv_data, time.time())
+            )
+
+    def write_notification(
+        self,
+        address: str,
+        characteristic: BleakGATTCharacteristic,
+        data: bytes | bytearray,
+    ):
+        if self.notifications is not None:
+            self.notifications.write(
+                notification_record(address, characteristic, data, time.time())
+            )
+
+    def __str__(self) -> str:
+        return export_summary(self.advertisements, self.notifications)
+
+
+def export_summary(
+    advertisements: StreamExporter | None = None,
+    notifications: StreamExporter | None = None,
+) -> str:
+    if advertisements is None or notifications is None:
+        return ""
+    return (
+        f"Advertisements: {advertisements.stats}, notifications: {notifications.stats}"
+    )
+
+
+exports = ExportManager()
@@ -0,0 +1,136 @@
+"""
+Text representations of advertisement data and characteristic values, and
+numeric decoding of characteristic values with a known format.
+"""
+
+import struct
+from typing import NamedTuple
+
+from bleak.backends.scanner import AdvertisementData
+
+# Payloads longer than this are truncated in the hex views
+MAX_HEX_BYTES = 64
+
+
+def format_hex(data: bytes, max_bytes: int = MAX_HEX_BYTES) -> str:
+    if len(data) <= max_bytes:
+        return f"0x{data.hex().upper()}"
+    return f"0x{data[:max_bytes].hex().upper()}... ({len(data)} bytes)"
+
+
+def format_value(data: bytes | bytearray, max_bytes: int = MAX_HEX_BYTES) -> str:
+    """Representation of a characteristic value."""
+    if len(data) <= max_bytes:
+        return str(data)
+    return f"{data[:max_bytes]}... ({len(data)} bytes)"
+
+
+class NumericFormat(NamedTuple):
+    """Little-endian number format of a characteristic value."""
+
+    size: int
+    signed: bool = False
+    is_float: bool = False
+    # Decimal exponent of the Characteristic Presentation Format
+    exponent: int = 0
+
+    def decode(self, data: bytes | bytearray) -> float | None:
+        """Value of 'data', None if it doesn't have the size of the format."""
+        if len(data) != self.size:
+            return None
+        if self.is_float:
+            (value,) = struct.unpack("<f" if self.size == 4 else "<d", data)
+        else:
+            value = int.from_bytes(data, "little", signed=self.signed)
+        if self.exponent:
+            value *= 10.0**self.exponent
+        return value
+
+
+# Names of the formats in the Bluetooth assigned numbers
+NUMERIC_FORMATS = {
+    "uint8": NumericFormat(1),
+    "uint16": NumericFormat(2),
+    "uint24": NumericFormat(3),
+    "uint32": NumericFormat(4),
+    "uint48": NumericFormat(6),
+    "uint64": NumericFormat(8),
+    "sint8": NumericFormat(1, signed=True),
+    "sint16": NumericFormat(2, signed=True),
+    "sint24": NumericFormat(3, signed=True),
+    "sint32": NumericFormat(4, signed=True),
+    "sint48": NumericFormat(6, signed=True),
+    "sint64": NumericFormat(8, signed=True),
+    "float32": NumericFormat(4, is_float=True),
+    "float64": NumericFormat(8, is_float=True),
+}
+
+PRESENTATION_FORMAT_UUID = "00002904-0000-1000-8000-00805f9b34fb"
+
+# Format field of the Characteristic Presentation Format descriptor. The
+# 12 and 128 bit formats (and the non-numeric ones) are not charted.
+PRESENTATION_FORMATS = {
+    0x04: "uint8",
+    0x06: "uint16",
+    0x07: "uint24",
+    0x08: "uint32",
+    0x09: "uint48",
+    0x0A: "uint64",
+    0x0C: "sint8",
+    0x0E: "sint16",
+    0x0F: "sint24",
+    0x10: "sint32",
+    0x11: "sint48",
+    0x12: "sint64",
+    0x14: "float32",
+    0x15: "float64",
+}
+
+
+def presentation_format(data: bytes | bytearray) -> tuple[str, NumericFormat] | None:
+    """Name and format of a Characteristic Presentation Format descriptor.
+
+    None if the descriptor is invalid or the format is not numeric.
+    """
+    if len(data) < 2:
+        return None
+    name = PRESENTATION_FORMATS.get(data[0])
+    if name is None:
+        return None
+    (exponent,) = struct.unpack("<b", data[1:2])
+    return name, NUMERIC_FORMATS[name]._replace(exponent=exponent)
+
+
+def advertisement_content_key(adv_data: AdvertisementData) -> tuple:
+    """Everything of an advertisement that format_advertisement shows.
+
+    The RSSI is not part of the key, so advertisements that only differ in
+    the RSSI have the same key (see dedup).
+    """
+    return (
+        adv_data.local_name,
+        tuple(sorted(adv_data.manufacturer_data.items())),
+        tuple(sorted(adv_data.service_data.items())),
+        tuple(adv_data.service_uuids),
+        adv_data.tx_power,
+    )
+
+
+def format_advertisement(
+    adv_data: AdvertisementData, max_hex_bytes: int = MAX_HEX_BYTES
+) -> str:
+    lines = []
+    if adv_data.local_name:
+        lines.append(f"Local Name: {adv_data.local_name}")
+    for company_id, data in adv_data.manufacturer_data.items():
+        lines.append("Manufacturer Data:")
+        lines.append(f"Company: 0x{company_id:04X}")
+        lines.append(format_hex(data, max_hex_bytes))
+    for key, data in adv_data.service_data.items():
+        lines.append(f"Service Data ({key}):")
+        lines.append(format_hex(data, max_hex_bytes))
+    if adv_data.tx_power:
+        lines.append(f"TX-Power: {adv_data.tx_power}")
+    for service_uuid in adv_data.service_uuids:
+        lines.append(f"Service UUID: {service_uuid}")
+    return "".join(f"{line}\n" for line in lines)
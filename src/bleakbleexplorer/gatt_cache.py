@@ -0,0 +1,191 @@
+"""
+Per-connection cache of characteristic values.
+
+Every read of a characteristic is an ATT round trip, which takes a few
+connection intervals on slow links. The GattReadCache answers reads from
+the cache while the cached value is fresh:
+
+- Values of the Device Information Service don't change during a connection
+  and are cached for the whole session.
+- Characteristics with active notifications are kept up to date by the
+  notifications. Once a notification arrived after subscribing, the value
+  is fresh as long as the subscription is active.
+- All other values are cached for 'default_ttl' seconds.
+"""
+
+import asyncio
+import dataclasses
+import math
+import time
+from typing import Callable
+
+from bleak import BleakClient
+from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak.uuids import normalize_uuid_16
+
+# Cache for the whole connection
+SESSION = math.inf
+
+# Values that don't change during a connection
+STATIC_UUIDS = frozenset(
+    normalize_uuid_16(uuid)
+    for uuid in (
+        0x2A01,  # Appearance
+        0x2A23,  # System ID
+        0x2A24,  # Model Number String
+        0x2A25,  # Serial Number String
+        0x2A26,  # Firmware Revision String
+        0x2A27,  # Hardware Revision String
+        0x2A28,  # Software Revision String
+        0x2A29,  # Manufacturer Name String
+        0x2A2A,  # IEEE 11073-20601 Regulatory Certification Data List
+        0x2A50,  # PnP ID
+    )
+)
+
+DEFAULT_TTL = 1.0
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    value: bytes
+    timestamp: float
+    ttl: float
+    # Received as notification (and not read)
+    notified: bool = False
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+    notifications: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        reads = self.hits + self.misses + self.refreshes
+        return self.hits / reads if reads else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Read cache: {self.hits} hits, {self.misses} misses, "
+            f"{self.refreshes} forced refreshes, {self.notifications} notifications "
+            f"({self.hit_rate:.0%} hit rate)"
+        )
+
+
+class GattReadCache:
+    def __init__(
+        self,
+        client: BleakClient,
+        default_ttl: float = DEFAULT_TTL,
+        ttl_overrides: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = client
+        self.default_ttl = default_ttl
+        # Characteristic UUID -> TTL in seconds
+        self.ttl_overrides = ttl_overrides or {}
+        self.clock = clock
+        self.stats = CacheStats()
+        # Characteristic handle -> cached value
+        self.entries: dict[int, CacheEntry] = {}
+        self.subscribed: set[int] = set()
+        # Reads in progress, so concurrent reads share one round trip
+        self.pending: dict[int, asyncio.Task[bytes]] = {}
+
+    def ttl_for(self, characteristic: BleakGATTCharacteristic) -> float:
+        if characteristic.uuid in self.ttl_overrides:
+            return self.ttl_overrides[characteristic.uuid]
+        if characteristic.uuid in STATIC_UUIDS:
+            return SESSION
+        return self.default_ttl
+
+    def cached_value(self, characteristic: BleakGATTCharacteristic) -> bytes | None:
+        """The cached value, if it is still fresh."""
+        entry = self.entries.get(characteristic.handle)
+        if entry is None:
+            return None
+        if entry.notified and characteristic.handle in self.subscribed:
+            return entry.value
+        if self.clock() - entry.timestamp < entry.ttl:
+            return entry.value
+        return None
+
+    def update(
+        self,
+        characteristic: BleakGATTCharacteristic,
+        value: bytes | bytearray,
+        notified: bool = False,
+        timestamp: float | None = None,
+    ):
+        """Cache 'value', unless the cache has a newer one than 'timestamp'."""
+        if timestamp is None:
+            timestamp = self.clock()
+        entry = self.entries.get(characteristic.handle)
+        if entry is not None and entry.timestamp > timestamp:
+            return
+        # A copy, so the cached value can't be changed by the callers
+        self.entries[characteristic.handle] = CacheEntry(
+            bytes(value), timestamp, self.ttl_for(characteristic), notified
+        )
+
+    def invalidate(self, characteristic: BleakGATTCharacteristic | None = None):
+        if characteristic is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(characteristic.handle, None)
+
+    async def read(
+        self, characteristic: BleakGATTCharacteristic, force_refresh: bool = False
+    ) -> bytes:
+        """Read the value of 'characteristic' from the cache or the device.
+
+        With 'force_refresh' the value is always read from the device.
+        """
+        if force_refresh:
+            self.stats.refreshes += 1
+        else:
+            value = self.cached_value(characteristic)
+            if value is not None:
+                self.stats.hits += 1
+                return value
+            self.stats.misses += 1
+
+        handle = characteristic.handle
+        task = self.pending.get(handle)
+        if task is None:
+            task = asyncio.create_task(self._read_from_device(characteristic))
+            self.pending[handle] = task
+            task.add_done_callback(lambda _: self.pending.pop(handle, None))
+        # A cancelled caller doesn't cancel the read of the others
+        return await asyncio.shield(task)
+
+    async def _read_from_device(self, characteristic: BleakGATTCharacteristic) -> bytes:
+        # A notification that arrives during the read is newer than its result
+        started = self.clock()
+        value = bytes(await self.client.read_gatt_char(characteristic))
+        self.update(characteristic, value, timestamp=started)
+        return value
+
+    async def start_notify(
+        self,
+        characteristic: BleakGATTCharacteristic,
+        callback: Callable[[BleakGATTCharacteristic, bytearray], None],
+    ):
+        """Subscribe to notifications, which also update the cache."""
+
+        def on_notification(sender: BleakGATTCharacteristic, data: bytearray):
+            self.stats.notifications += 1
+            self.update(characteristic, data, notified=True)
+            callback(sender, data)
+
+        # Values from before the subscription are not kept up to date
+        self.invalidate(characteristic)
+        await self.client.start_notify(characteristic, on_notification)
+        self.subscribed.add(characteristic.handle)
+
+    async def stop_notify(self, characteristic: BleakGATTCharacteristic):
+        self.subscribed.discard(characteristic.handle)
+        await self.client.stop_notify(characteristic)
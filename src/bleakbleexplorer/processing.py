@@ -0,0 +1,127 @@
+"""
+Processing stage that keeps CPU heavy work off the UI event loop.
+
+The toga event loop also runs the BleakScanner callbacks and the BleakClient
+I/O, so big batches of advertisements are processed on a worker pool and
+only the results are posted back to the loop.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Batches with fewer items are processed inline. Classifying an advertisement
+# takes ~2.5 µs on a desktop (several times that on a phone), handing a job
+# to a worker thread and back ~70 µs. A single payload (at most 512 bytes of
+# a GATT value or 31 bytes of an advertisement) is always cheaper inline.
+OFFLOAD_BATCH_SIZE = 256
+
+
+class ProcessingPool:
+    """Worker threads for CPU heavy work.
+
+    Threads are used, because processes are not available on all platforms
+    (e.g. iOS) and the advertisements contain native backend objects that
+    can't be sent to another process.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created lazily, so that importing the module doesn't start workers
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix="bleakbleexplorer-processing"
+            )
+        return self._executor
+
+    async def run(self, func: Callable[..., R], *args: Any) -> R:
+        """Run 'func(*args)' on the pool and return its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def run_batch(self, func: Callable[..., R], items: list[T], *args: Any) -> R:
+        """Run 'func(items, *args)', on the pool if the batch is big.
+
+        Batches with less than OFFLOAD_BATCH_SIZE items run inline.
+        """
+        if len(items) < OFFLOAD_BATCH_SIZE:
+            return func(items, *args)
+        return await self.run(func, items, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+processing_pool = ProcessingPool()
+
+
+class BatchProcessor(Generic[T, R]):
+    """Processes submitted items in batches.
+
+    Items are collected for 'interval' seconds (or until 'max_batch' items
+    are queued), processed with 'process_batch' and the results are passed
+    to 'on_results' on the event loop, so the UI is updated once per batch
+    instead of once per item. 'process_batch' runs on the event loop and
+    can hand big batches to the pool with ProcessingPool.run_batch.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[list[T]], Awaitable[list[R]]],
+        on_results: Callable[[list[R]], None],
+        interval: float = 0.1,
+        max_batch: int = 500,
+    ):
+        self.process_batch = process_batch
+        self.on_results = on_results
+        self.interval = interval
+        self.max_batch = max_batch
+        self.pending: list[T] = []
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    def submit(self, item: T):
+        self.pending.append(item)
+        if len(self.pending) >= self.max_batch:
+            self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._process_pending())
+
+    async def _process_pending(self):
+        while self.pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Process all pending items now."""
+        while self.pending:
+            items, self.pending = (
+                self.pending[: self.max_batch],
+                self.pending[self.max_batch :],
+            )
+            results = await self.process_batch(items)
+            if results:
+                self.on_results(results)
+
+    async def close(self):
+        """Process the pending items and stop."""
+        if self._task is not None:
+            # Let the running batch finish instead of losing its items
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
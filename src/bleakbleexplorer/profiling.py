@@ -0,0 +1,158 @@
+"""
+Opt-in profiling of layout and widget operations.
+
+When installed, the profiler records the time of every layout pass, every
+add/insert/remove/clear of widgets and the construction of every list row
+(per row class), together with the current screen. The recorded spans can
+be written as Chrome trace (open it in chrome://tracing or ui.perfetto.dev).
+
+Enable it by setting BLEAK_EXPLORER_PROFILE to the path of the trace file
+(or to 1 for "ui-trace.json" in the app data directory). The trace is
+written when the app exits.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import toga
+from toga.style import Pack
+
+from bleakbleexplorer.custom_list_view import CustomListRow
+from bleakbleexplorer.diagnostics import diagnostics
+
+
+def _layout_name(style: Pack) -> str | None:
+    """Span name of a layout pass, None if the node can't be found.
+
+    The node of a style is only reachable through the private applicator of
+    travertino, so layout spans are skipped if that changes.
+    """
+    node = getattr(getattr(style, "_applicator", None), "node", None)
+    if node is None:
+        return None
+    return f"layout {type(node).__name__}"
+
+
+def _all_subclasses(cls: type) -> list[type]:
+    subclasses = []
+    for subclass in cls.__subclasses__():
+        subclasses.append(subclass)
+        subclasses.extend(_all_subclasses(subclass))
+    return subclasses
+
+
+class Profiler:
+    def __init__(self, max_events: int = 1_000_000):
+        self.events: deque[dict[str, Any]] = deque(maxlen=max_events)
+        self.installed = False
+        # (owner, attribute, method defined by owner or None) of the patches
+        self._originals: list[tuple[type, str, Callable | None]] = []
+        self._pid = os.getpid()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[None]:
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": start / 1000,
+                    "dur": (time.perf_counter_ns() - start) / 1000,
+                    "pid": self._pid,
+                    "tid": threading.get_ident(),
+                    "args": {"screen": diagnostics.current_screen, **args},
+                }
+            )
+
+    def _patch(
+        self,
+        owner: type,
+        attribute: str,
+        category: str,
+        name: Callable[[Any], str | None],
+    ):
+        """Record the calls of 'owner.attribute', unless 'name' returns None."""
+        original = getattr(owner, attribute)
+
+        @functools.wraps(original)
+        def wrapper(obj, *args, **kwargs):
+            span_name = name(obj)
+            if span_name is None:
+                return original(obj, *args, **kwargs)
+            with self.span(span_name, category):
+                return original(obj, *args, **kwargs)
+
+        self._originals.append((owner, attribute, owner.__dict__.get(attribute)))
+        setattr(owner, attribute, wrapper)
+
+    def install(self):
+        """Patch the layout, the widget tree operations and the row classes."""
+        if self.installed:
+            return
+        self.installed = True
+
+        self._patch(Pack, "layout", "layout", _layout_name)
+        for operation in ("add", "insert", "remove", "clear"):
+            self._patch(
+                toga.Widget,
+                operation,
+                "tree",
+                lambda widget, operation=operation: (
+                    f"{type(widget).__name__}.{operation}"
+                ),
+            )
+        for row_class in _all_subclasses(CustomListRow):
+            if "__init__" in row_class.__dict__:
+                self._patch(
+                    row_class,
+                    "__init__",
+                    "row",
+                    lambda row, row_class=row_class: f"new {row_class.__name__}",
+                )
+
+    def uninstall(self):
+        for owner, attribute, original in reversed(self._originals):
+            if original is None:
+                # The method was inherited
+                delattr(owner, attribute)
+            else:
+                setattr(owner, attribute, original)
+        self._originals.clear()
+        self.installed = False
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Number of calls and total time in ms per span name."""
+        summary: dict[str, dict[str, float]] = {}
+        for event in list(self.events):
+            stats = summary.setdefault(event["name"], {"count": 0, "total_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += event["dur"] / 1000
+        return summary
+
+    def write_trace(self, path: Path):
+        with open(path, "w") as file:
+            json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms"}, file)
+
+
+profiler = Profiler()
+
+
+def trace_path(data_dir: Path) -> Path | None:
+    """Trace file configured with BLEAK_EXPLORER_PROFILE, None if disabled."""
+    value = os.environ.get("BLEAK_EXPLORER_PROFILE")
+    if not value:
+        return None
+    if value == "1":
+        return data_dir / "ui-trace.json"
+    return Path(value)
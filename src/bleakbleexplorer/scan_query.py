@@ -0,0 +1,178 @@
+"""
+Awaitable queries on the advertisements seen by a BleakScanner.
+
+Instead of sleeping for a fixed time and looking at the results afterwards,
+the functions in this module resolve as soon as a matching advertisement
+is received (or raise a TimeoutError).
+"""
+
+import asyncio
+import dataclasses
+from typing import Callable
+
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from bleak.uuids import normalize_uuid_str
+
+ScanResult = tuple[BLEDevice, AdvertisementData]
+
+
+@dataclasses.dataclass(frozen=True)
+class ScanFilter:
+    """Criteria an advertisement has to match.
+
+    All given criteria have to match. Criteria that are None are ignored, so
+    `ScanFilter()` matches every advertisement.
+    """
+
+    address: str | None = None
+    name: str | None = None
+    service_uuid: str | None = None
+    manufacturer_id: int | None = None
+    # Prefix of the manufacturer data
+    manufacturer_data: bytes | None = None
+    predicate: Callable[[BLEDevice, AdvertisementData], bool] | None = None
+
+    def matches(self, device: BLEDevice, adv_data: AdvertisementData) -> bool:
+        if self.address is not None and (
+            device.address.upper() != self.address.upper()
+        ):
+            return False
+        if self.name is not None and self.name not in (
+            adv_data.local_name,
+            device.name,
+        ):
+            return False
+        if (
+            self.service_uuid is not None
+            and normalize_uuid_str(self.service_uuid) not in adv_data.service_uuids
+            and normalize_uuid_str(self.service_uuid) not in adv_data.service_data
+        ):
+            return False
+        if self.manufacturer_id is not None or self.manufacturer_data is not None:
+            if self.manufacturer_id is not None:
+                payloads = [adv_data.manufacturer_data.get(self.manufacturer_id)]
+            else:
+                payloads = list(adv_data.manufacturer_data.values())
+            prefix = self.manufacturer_data or b""
+            if not any(
+                payload is not None and payload.startswith(prefix)
+                for payload in payloads
+            ):
+                return False
+        if self.predicate is not None and not self.predicate(device, adv_data):
+            return False
+        return True
+
+
+async def _next_match(scanner: BleakScanner, scan_filter: ScanFilter) -> ScanResult:
+    # There is no await between checking the already discovered devices and
+    # registering the callback in advertisement_data(), so no advertisement
+    # can be missed.
+    for device, adv_data in scanner.discovered_devices_and_advertisement_data.values():
+        if scan_filter.matches(device, adv_data):
+            return device, adv_data
+    async for device, adv_data in scanner.advertisement_data():
+        if scan_filter.matches(device, adv_data):
+            return device, adv_data
+    raise RuntimeError("Advertisement stream ended unexpectedly")
+
+
+async def wait_for_advertisement(
+    scanner: BleakScanner,
+    scan_filter: ScanFilter = ScanFilter(),
+    timeout: float = 10.0,
+) -> ScanResult:
+    """Wait until 'scanner' sees an advertisement that matches 'scan_filter'.
+
+    Devices already discovered by the scanner are considered too. The scanner
+    has to be running. Raises TimeoutError if nothing matches within 'timeout'
+    seconds.
+    """
+    return await asyncio.wait_for(_next_match(scanner, scan_filter), timeout)
+
+
+async def wait_for_device(
+    scanner: BleakScanner,
+    scan_filter: ScanFilter = ScanFilter(),
+    timeout: float = 10.0,
+) -> BLEDevice:
+    """Same as wait_for_advertisement(), but only returns the device."""
+    device, _ = await wait_for_advertisement(scanner, scan_filter, timeout)
+    return device
+
+
+async def wait_for_devices(
+    scanner: BleakScanner,
+    scan_filter: ScanFilter,
+    count: int,
+    timeout: float = 10.0,
+) -> dict[str, ScanResult]:
+    """Wait until 'count' different devices matching 'scan_filter' are seen.
+
+    Returns a dictionary in the same format as
+    `scanner.discovered_devices_and_advertisement_data`.
+    """
+
+    async def collect() -> dict[str, ScanResult]:
+        found = {
+            address: result
+            for address, result in scanner.discovered_devices_and_advertisement_data.items()
+            if scan_filter.matches(*result)
+        }
+        if len(found) >= count:
+            return found
+        async for device, adv_data in scanner.advertisement_data():
+            if scan_filter.matches(device, adv_data):
+                found[device.address] = (device, adv_data)
+                if len(found) >= count:
+                    break
+        return found
+
+    return await asyncio.wait_for(collect(), timeout)
+
+
+async def wait_until_settled(
+    scanner: BleakScanner,
+    quiet_period: float = 1.0,
+    timeout: float = 5.0,
+) -> dict[str, ScanResult]:
+    """Wait until no new device was discovered for 'quiet_period' seconds.
+
+    Returns the discovered devices at the latest after 'timeout' seconds, so
+    a scan takes only as long as new devices keep showing up.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    seen = set(scanner.discovered_devices_and_advertisement_data)
+
+    async def wait_for_new_device():
+        async for device, _ in scanner.advertisement_data():
+            if device.address not in seen:
+                seen.add(device.address)
+                return
+
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            await asyncio.wait_for(wait_for_new_device(), min(quiet_period, remaining))
+        except TimeoutError:
+            break
+    return scanner.discovered_devices_and_advertisement_data
+
+
+async def find_advertisement(
+    scan_filter: ScanFilter = ScanFilter(),
+    timeout: float = 10.0,
+    **scanner_kwargs,
+) -> ScanResult:
+    """Start a scanner and stop it as soon as 'scan_filter' matches.
+
+    Intended for headless tools and tests that don't have a running scanner.
+    'scanner_kwargs' are passed to BleakScanner.
+    """
+    async with BleakScanner(**scanner_kwargs) as scanner:
+        return await wait_for_advertisement(scanner, scan_filter, timeout)
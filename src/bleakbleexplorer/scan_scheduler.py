@@ -0,0 +1,165 @@
+"""
+Duty-cycled scanning for continuous monitoring.
+
+Instead of scanning all the time, the ScanScheduler scans for 'on_time'
+seconds and pauses for 'off_time' seconds. With the adaptive policy the
+pause grows while the set of devices is stable. As soon as new devices show
+up, the pause falls back to the configured 'off_time' and the scanner scans
+harder: the scan window grows up to 'max_on_time' and passive scanning
+switches to active scanning (to get the scan responses of the new devices).
+Once the devices are stable again, the configured window and mode are used.
+"""
+
+import asyncio
+import dataclasses
+from collections import deque
+from typing import Callable, Literal
+
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+from bleakbleexplorer.scan_query import ScanResult
+
+
+@dataclasses.dataclass(frozen=True)
+class ScanSchedule:
+    scanning_mode: Literal["active", "passive"] = "active"
+    on_time: float = 3.0
+    off_time: float = 2.0
+    # Grow the pause while no new devices show up
+    adaptive: bool = True
+    backoff_factor: float = 2.0
+    max_off_time: float = 30.0
+    # Grow the scan window while new devices show up
+    max_on_time: float = 10.0
+
+    def next_off_time(self, off_time: float, new_devices: int) -> float:
+        """Pause after a cycle that found 'new_devices' new devices."""
+        if not self.adaptive or new_devices > 0:
+            return self.off_time
+        return min(off_time * self.backoff_factor, self.max_off_time)
+
+    def next_on_time(self, on_time: float, new_devices: int) -> float:
+        """Scan window of the cycle after one with 'new_devices' new devices."""
+        if not self.adaptive or new_devices == 0:
+            return self.on_time
+        return max(min(on_time * self.backoff_factor, self.max_on_time), self.on_time)
+
+    def next_scanning_mode(self, new_devices: int) -> Literal["active", "passive"]:
+        """Scanning mode of the cycle after one with 'new_devices' new devices."""
+        if self.adaptive and new_devices > 0:
+            return "active"
+        return self.scanning_mode
+
+
+@dataclasses.dataclass
+class CycleStats:
+    cycle: int
+    scanning_mode: str
+    duration: float
+    advertisements: int
+    devices: int
+    new_devices: int
+    # Pause until the next cycle
+    off_time: float = 0.0
+
+    @property
+    def duty_cycle(self) -> float:
+        total = self.duration + self.off_time
+        return self.duration / total if total > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Cycle {self.cycle} ({self.scanning_mode}): {self.duration:.1f} s, "
+            f"{self.advertisements} advertisements from {self.devices} devices, "
+            f"{self.new_devices} new, next scan in {self.off_time:.0f} s"
+        )
+
+
+class ScanScheduler:
+    def __init__(
+        self,
+        schedule: ScanSchedule,
+        detection_callback: Callable[[BLEDevice, AdvertisementData], None],
+        on_cycle: Callable[[CycleStats], None],
+        scanner_factory: Callable[..., BleakScanner] = BleakScanner,
+    ):
+        self.schedule = schedule
+        self.detection_callback = detection_callback
+        self.on_cycle = on_cycle
+        self.scanner_factory = scanner_factory
+        # Latest advertisement of every device seen in any cycle
+        self.discovered: dict[str, ScanResult] = {}
+        # Stats of the latest cycles
+        self.cycles: deque[CycleStats] = deque(maxlen=100)
+        self._stop = asyncio.Event()
+
+    def stop(self):
+        """Stop the running cycle and return from run()."""
+        self._stop.set()
+
+    async def _wait_for_stop(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout)
+        except TimeoutError:
+            pass
+        return self._stop.is_set()
+
+    async def run_cycle(
+        self,
+        cycle: int,
+        on_time: float | None = None,
+        scanning_mode: Literal["active", "passive"] | None = None,
+    ) -> CycleStats:
+        """Scan for 'on_time' seconds in 'scanning_mode' (default: the schedule)."""
+        if on_time is None:
+            on_time = self.schedule.on_time
+        if scanning_mode is None:
+            scanning_mode = self.schedule.scanning_mode
+        known = set(self.discovered)
+        seen: set[str] = set()
+        advertisements = 0
+
+        def callback(device: BLEDevice, adv_data: AdvertisementData):
+            nonlocal advertisements
+            advertisements += 1
+            seen.add(device.address)
+            self.discovered[device.address] = (device, adv_data)
+            self.detection_callback(device, adv_data)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with self.scanner_factory(
+            detection_callback=callback,
+            scanning_mode=scanning_mode,
+        ):
+            await self._wait_for_stop(on_time)
+
+        return CycleStats(
+            cycle=cycle,
+            scanning_mode=scanning_mode,
+            duration=loop.time() - start,
+            advertisements=advertisements,
+            devices=len(seen),
+            new_devices=len(seen - known),
+        )
+
+    async def run(self):
+        """Run scan cycles until stop() is called."""
+        schedule = self.schedule
+        on_time = schedule.on_time
+        off_time = schedule.off_time
+        scanning_mode = schedule.scanning_mode
+        cycle = 0
+        while not self._stop.is_set():
+            cycle += 1
+            stats = await self.run_cycle(cycle, on_time, scanning_mode)
+            on_time = schedule.next_on_time(on_time, stats.new_devices)
+            off_time = schedule.next_off_time(off_time, stats.new_devices)
+            scanning_mode = schedule.next_scanning_mode(stats.new_devices)
+            stats.off_time = off_time
+            self.cycles.append(stats)
+            self.on_cycle(stats)
+            if await self._wait_for_stop(off_time):
+                break
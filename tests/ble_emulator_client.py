@@ -1,9 +1,14 @@
+from typing import Any
+
+import httpx
 import requests
 
 
 class EmulatorControllerClient:
     def __init__(self):
         self.base_url = "http://localhost:8000/"
+        # Reuse the TCP connection between calls
+        self.session = requests.Session()
 
     def ping(self):
         response = self.get("ping")
@@ -36,13 +41,140 @@ class EmulatorControllerClient:
 
     def get(self, path: str, **kwargs):
         url = f"{self.base_url}{path}"
-        response = requests.get(url, **kwargs)
+        response = self.session.get(url, **kwargs)
         response.raise_for_status()
         return response.json()
 
     def post(self, path: str, data=None, json=None, **kwargs):
         url = f"{self.base_url}{path}"
-        response = requests.post(url, data=data, json=json, **kwargs)
+        response = self.session.post(url, data=data, json=json, **kwargs)
+        if response.status_code == 500:
+            raise RuntimeError(f"Server error: {response.text}")
+        response.raise_for_status()
+        return response.json()
+
+
+class EmulatorBatch:
+    """Collects controller operations to send them with a single request.
+
+    The methods mirror the ones of AsyncEmulatorControllerClient.
+    """
+
+    def __init__(self):
+        self.operations: list[dict[str, Any]] = []
+
+    def add(self, op: str, **params) -> "EmulatorBatch":
+        self.operations.append({"op": op, "params": params})
+        return self
+
+    def ping(self) -> "EmulatorBatch":
+        return self.add("ping")
+
+    def grand_permission(self, package: str, permission: str) -> "EmulatorBatch":
+        return self.add("grant_permission", package=package, permission=permission)
+
+    def revoke_permission(self, package: str, permission: str) -> "EmulatorBatch":
+        return self.add("revoke_permission", package=package, permission=permission)
+
+    def activate_bluetooth(self) -> "EmulatorBatch":
+        return self.add("activate_bluetooth")
+
+    def ble_peripheral_start(self, typ: str, **kwargs) -> "EmulatorBatch":
+        return self.add("ble_peripheral_start", typ=typ, **kwargs)
+
+    def ble_peripheral_stop(self, peripheral_id: str) -> "EmulatorBatch":
+        return self.add("ble_peripheral_stop", peripheral_id=peripheral_id)
+
+    def ble_peripheral_stop_all(self, namespace: str | None = None) -> "EmulatorBatch":
+        return self.add("ble_peripheral_stop_all", namespace=namespace)
+
+
+class AsyncEmulatorControllerClient:
+    """Async variant of EmulatorControllerClient.
+
+    All calls share a pool of keep-alive connections, so it can be used from
+    async tests without blocking the event loop. Close it with `aclose()` or
+    use it as async context manager.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:8000/", max_connections=4):
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=30.0,
+        )
+
+    async def __aenter__(self) -> "AsyncEmulatorControllerClient":
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def ping(self):
+        response = await self.get("ping/")
+        if response != "pong":
+            raise RuntimeError(f"Unexpected response: {response}")
+
+    async def grand_permission(self, package: str, permission: str):
+        await self.post(
+            "grant_permission/",
+            params={
+                "package": package,
+                "permission": permission,
+            },
+        )
+
+    async def revoke_permission(self, package: str, permission: str):
+        await self.post(
+            "revoke_permission/",
+            params={
+                "package": package,
+                "permission": permission,
+            },
+        )
+
+    async def activate_bluetooth(self):
+        await self.post("activate_bluetooth/")
+
+    async def ble_peripheral_start(self, typ: str, **kwargs) -> dict[str, str]:
+        """Start a peripheral and return its "peripheral_id" and "address"."""
+        return await self.post("ble_peripheral/start/", params={"typ": typ, **kwargs})
+
+    async def ble_peripheral_stop(self, peripheral_id: str):
+        await self.post("ble_peripheral/stop/", params={"peripheral_id": peripheral_id})
+
+    async def ble_peripheral_stop_all(self, namespace: str | None = None):
+        params = {} if namespace is None else {"namespace": namespace}
+        await self.post("ble_peripheral/stop_all/", params=params)
+
+    async def batch(self, batch: EmulatorBatch, stop_on_error: bool = True) -> list:
+        """Send all operations of 'batch' with one request and return their results.
+
+        Raises a RuntimeError if one of the operations failed.
+        """
+        response = await self.post(
+            "batch/",
+            json=batch.operations,
+            params={"stop_on_error": stop_on_error},
+        )
+        errors = [entry for entry in response if "error" in entry]
+        if errors:
+            raise RuntimeError(f"Batch operations failed: {errors}")
+        return [entry["result"] for entry in response]
+
+    async def get(self, path: str, **kwargs):
+        response = await self.client.get(path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def post(self, path: str, data=None, json=None, **kwargs):
+        response = await self.client.post(path, data=data, json=json, **kwargs)
         if response.status_code == 500:
             raise RuntimeError(f"Server error: {response.text}")
         response.raise_for_status()
@@ -1,13 +1,23 @@
 import asyncio
 import contextlib
 import inspect
+import os
+import zlib
 from dataclasses import dataclass
 from typing import Generator
 
 import pytest
-from toga_android.libs.events import AndroidEventLoop
 
-from .emulator_controller_client import EmulatorControllerClient
+try:
+    from toga_android.libs.events import AndroidEventLoop
+except ImportError:
+    # Headless run outside of the app (e.g. on a desktop or in CI). Only the
+    # tests that need neither the app nor the emulator can pass there.
+    AndroidEventLoop = None
+    os.environ.setdefault("TOGA_BACKEND", "toga_dummy")
+
+from .ble_emulator_client import AsyncEmulatorControllerClient, EmulatorControllerClient
+from .emulated_peripherals import EmulatedPeripheralPool
 
 loop = None
 
@@ -20,13 +30,60 @@ def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
     loop.run_forever_cooperatively()
 
 
+def pytest_addoption(parser: pytest.Parser):
+    # The test suite can be split into shards that run in parallel, e.g. on
+    # several emulators. Every test uses its own emulated peripherals, so the
+    # shards can share one emulator controller.
+    parser.addoption(
+        "--shard-id",
+        type=int,
+        default=int(os.environ.get("BLEAK_EXPLORER_SHARD_ID", "0")),
+        help="Index of the shard to run (0 based)",
+    )
+    parser.addoption(
+        "--num-shards",
+        type=int,
+        default=int(os.environ.get("BLEAK_EXPLORER_NUM_SHARDS", "1")),
+        help="Total number of shards",
+    )
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]):
+    shard_id = config.getoption("--shard-id")
+    num_shards = config.getoption("--num-shards")
+    if num_shards <= 1:
+        return
+    if not 0 <= shard_id < num_shards:
+        raise pytest.UsageError(f"--shard-id must be between 0 and {num_shards - 1}")
+
+    # Round robin over the sorted node ids gives every shard the same number
+    # of tests, independent of the collection order.
+    selected, deselected = [], []
+    for index, item in enumerate(sorted(items, key=lambda item: item.nodeid)):
+        (selected if index % num_shards == shard_id else deselected).append(item)
+    selected_ids = {id(item) for item in selected}
+    items[:] = [item for item in items if id(item) in selected_ids]
+    config.hook.pytest_deselected(items=deselected)
+
+
+def worker_id(config: pytest.Config) -> str:
+    """Name of this worker: the pytest-xdist worker or the shard."""
+    return os.environ.get(
+        "PYTEST_XDIST_WORKER", f"shard{config.getoption('--shard-id')}"
+    )
+
+
 # This is copied from the toga testbed (https://github.com/beeware/toga/blob/b7c1e927a249068892f2e2b1e17d6725eda894c3/testbed/tests/conftest.py#L133-L189)
 
 
 # Controls the event loop used by pytest-asyncio.
 @pytest.fixture(scope="session")
 def event_loop_policy():
-    yield ProxyEventLoopPolicy(ProxyEventLoop(loop))
+    if loop is None:
+        # Headless run, the tests use their own event loop
+        yield asyncio.get_event_loop_policy()
+    else:
+        yield ProxyEventLoopPolicy(ProxyEventLoop(loop))
 
 
 # Loop policy that ensures proxy loop is always used.
@@ -87,3 +144,29 @@ def emulator_controller() -> EmulatorControllerClient:
     emulator_controller = EmulatorControllerClient()
     emulator_controller.ping()
     return emulator_controller
+
+
+@pytest.fixture(scope="session")
+async def async_emulator_controller():
+    base_url = os.environ.get("EMULATOR_CONTROLLER_URL", "http://localhost:8000/")
+    async with AsyncEmulatorControllerClient(base_url) as emulator_controller:
+        await emulator_controller.ping()
+        yield emulator_controller
+
+
+@pytest.fixture
+async def ble_peripherals(
+    request: pytest.FixtureRequest,
+    async_emulator_controller: AsyncEmulatorControllerClient,
+):
+    """Emulated peripherals that belong only to the running test.
+
+    They are stopped again after the test.
+    """
+    test_hash = zlib.crc32(request.node.nodeid.encode())
+    namespace = f"{worker_id(request.config)}-{test_hash:08x}"
+    pool = EmulatedPeripheralPool(async_emulator_controller, namespace)
+    # Remove leftovers of an aborted run of the same test
+    await pool.stop_all()
+    yield pool
+    await pool.stop_all()
@@ -0,0 +1,51 @@
+import dataclasses
+import itertools
+
+from bleakbleexplorer.scan_query import ScanFilter
+
+from .ble_emulator_client import AsyncEmulatorControllerClient
+
+
+@dataclasses.dataclass
+class EmulatedPeripheral:
+    peripheral_id: str
+    address: str
+    name: str
+
+    @property
+    def scan_filter(self) -> ScanFilter:
+        """Matches only the advertisements of this peripheral."""
+        return ScanFilter(address=self.address)
+
+
+class EmulatedPeripheralPool:
+    """Peripherals of a single test, isolated from other tests and workers.
+
+    All peripherals are started in their own namespace on the emulator
+    controller and get a unique address allocated by it, so tests running
+    in parallel (against the same controller) never see each other's
+    peripherals through their scan filters.
+    """
+
+    def __init__(self, controller: AsyncEmulatorControllerClient, namespace: str):
+        self.controller = controller
+        self.namespace = namespace
+        self.peripherals: list[EmulatedPeripheral] = []
+        self._counter = itertools.count()
+
+    async def start(self, typ: str = "example", **kwargs) -> EmulatedPeripheral:
+        name = kwargs.pop("name", f"{self.namespace}-{next(self._counter)}")
+        response = await self.controller.ble_peripheral_start(
+            typ, name=name, namespace=self.namespace, **kwargs
+        )
+        peripheral = EmulatedPeripheral(
+            peripheral_id=response["peripheral_id"],
+            address=response["address"],
+            name=name,
+        )
+        self.peripherals.append(peripheral)
+        return peripheral
+
+    async def stop_all(self):
+        await self.controller.ble_peripheral_stop_all(namespace=self.namespace)
+        self.peripherals.clear()
@@ -0,0 +1,40 @@
+"""
+Scan results for the tests that don't need the emulator.
+"""
+
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+SERVICE_UUID = "0000180f-0000-1000-8000-00805f9b34fb"
+
+
+def make_advertisement(**kwargs) -> tuple[BLEDevice, AdvertisementData]:
+    adv_data = AdvertisementData(
+        local_name=kwargs.get("local_name", "Bumble"),
+        manufacturer_data=kwargs.get("manufacturer_data", {0x004C: b"\x02\x15abc"}),
+        service_data=kwargs.get("service_data", {}),
+        service_uuids=kwargs.get("service_uuids", [SERVICE_UUID]),
+        tx_power=kwargs.get("tx_power"),
+        rssi=kwargs.get("rssi", -60),
+        platform_data=(),
+    )
+    device = BLEDevice(kwargs.get("address", "F0:F1:F2:F3:F4:F5"), "Bumble", None)
+    return device, adv_data
+
+
+def make_scan_results(count: int) -> list[tuple[BLEDevice, AdvertisementData]]:
+    return [
+        (
+            BLEDevice(f"F0:F1:F2:F3:{i // 256:02X}:{i % 256:02X}", f"Device {i}", None),
+            AdvertisementData(
+                local_name=f"Device {i}",
+                manufacturer_data={0x004C: bytes(20)},
+                service_data={},
+                service_uuids=[],
+                tx_power=None,
+                rssi=-60,
+                platform_data=(),
+            ),
+        )
+        for i in range(count)
+    ]
@@ -0,0 +1,66 @@
+import numpy as np
+
+from bleakbleexplorer.analytics import RssiAnalytics
+
+
+def test_smoothing_reduces_noise():
+    rng = np.random.default_rng(0)
+    analytics = RssiAnalytics(smoothing="kalman")
+    errors = []
+    for _ in range(100):
+        analytics.add_sample("A", -70 + rng.normal(0, 4))
+        stats = analytics.update()["A"]
+        errors.append(abs(stats.smoothed + 70))
+    assert np.mean(errors[20:]) < 1.5
+    assert 1 < stats.std < 8
+    assert stats.samples == 100
+
+
+def test_update_covers_all_devices_with_queued_samples():
+    analytics = RssiAnalytics(smoothing="ema", alpha=0.5, capacity=2)
+    analytics.add_sample("A", -60)
+    analytics.add_sample("B", -80)
+    analytics.add_sample("C", -70)
+    assert set(analytics.update()) == {"A", "B", "C"}
+
+    # Two samples within one update move the EMA as far as two updates
+    analytics.add_sample("A", -40)
+    analytics.add_sample("A", -40)
+    assert analytics.update()["A"].smoothed == -45.0
+    assert set(analytics.update()) == set()
+    assert analytics.ranking() == ["A", "C", "B"]
+
+
+def test_distance_uses_advertised_tx_power():
+    analytics = RssiAnalytics(path_loss_exponent=2.0)
+    # No TX power: -59 dBm at 1 m
+    analytics.add_sample("A", -79)
+    # TX power -4 dBm: -45 dBm at 1 m
+    analytics.add_sample("B", -45, tx_power=-4)
+    stats = analytics.update()
+    assert stats["A"].distance == 10.0
+    assert stats["B"].distance == 1.0
+
+
+def test_kalman_std_is_the_error_of_the_estimate():
+    analytics = RssiAnalytics(
+        smoothing="kalman", process_noise=1.0, measurement_noise=16.0
+    )
+    for _ in range(50):
+        analytics.add_sample("A", -70)
+        stats = analytics.update()["A"]
+    # Steady state of the error covariance: P² + P - 16 = 0
+    assert abs(stats.std**2 - (-1 + 65**0.5) / 2) < 1e-6
+    assert analytics.stats("A") == stats
+
+
+def test_reset_forgets_all_devices():
+    analytics = RssiAnalytics(capacity=1)
+    analytics.add_sample("A", -60)
+    analytics.add_sample("B", -70)
+    analytics.update()
+    analytics.add_sample("A", -50)
+    analytics.reset()
+    assert len(analytics) == 0
+    assert analytics.stats("A") is None
+    assert analytics.update() == {}
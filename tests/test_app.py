@@ -1,8 +1,17 @@
-import asyncio
-
 from bleak import BleakScanner
 
-from .emulator_controller_client import EmulatorControllerClient
+from bleakbleexplorer.scan_query import (
+    ScanFilter,
+    wait_for_advertisement,
+    wait_for_device,
+)
+
+from .ble_emulator_client import (
+    AsyncEmulatorControllerClient,
+    EmulatorBatch,
+    EmulatorControllerClient,
+)
+from .emulated_peripherals import EmulatedPeripheralPool
 
 
 def test_first():
@@ -21,13 +30,46 @@ def test_first2(emulator_controller: EmulatorControllerClient):
     emulator_controller.gatt_server_start()
 
 
+async def test_emulator_batch_setup(
+    async_emulator_controller: AsyncEmulatorControllerClient,
+):
+    """Prepare the emulator with a single request."""
+    batch = (
+        EmulatorBatch()
+        .grand_permission(
+            package="com.timrid.bleakbleexplorer",
+            permission="android.permission.BLUETOOTH_SCAN",
+        )
+        .activate_bluetooth()
+        .ble_peripheral_start(typ="example")
+    )
+    results = await async_emulator_controller.batch(batch)
+    assert len(results) == 3
+    await async_emulator_controller.ble_peripheral_stop(results[2]["peripheral_id"])
+
+
 async def test_bleak_scanner(emulator_controller: EmulatorControllerClient):
     # breakpoint()
     async with BleakScanner() as scanner:
-        await asyncio.sleep(5)
+        await wait_for_device(scanner, ScanFilter(), timeout=5)
         assert len(scanner.discovered_devices) == 1
 
 
 async def test_bleak_scanner2():
     result = await BleakScanner.discover(return_adv=True)
     assert len(result) == 1
+
+
+async def test_scan_finds_own_peripherals(ble_peripherals: EmulatedPeripheralPool):
+    """Only the peripherals of this test are matched, even if others are running."""
+    example = await ble_peripherals.start("example")
+    battery = await ble_peripherals.start("batteryservice")
+    async with BleakScanner() as scanner:
+        device, _ = await wait_for_advertisement(
+            scanner, example.scan_filter, timeout=10
+        )
+        assert device.address == example.address
+        device, _ = await wait_for_advertisement(
+            scanner, battery.scan_filter, timeout=10
+        )
+        assert device.address == battery.address
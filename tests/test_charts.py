@@ -0,0 +1,113 @@
+import asyncio
+
+import toga
+from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak.backends.descriptor import BleakGATTDescriptor
+from bleak.uuids import normalize_uuid_16
+
+from bleakbleexplorer.ble_device_box import CharacteristicRow
+from bleakbleexplorer.charts import TimeSeriesChart
+from bleakbleexplorer.formatting import NUMERIC_FORMATS, PRESENTATION_FORMAT_UUID
+from bleakbleexplorer.gatt_cache import GattReadCache
+
+
+def show_in_window(widget: toga.Widget) -> toga.Widget | None:
+    """Show 'widget' in the main window and return the previous content."""
+    # The running app on a device, a dummy app in headless runs
+    app = toga.App.app or toga.App("Bleak BLE Explorer", "org.example.charts")
+    content = app.main_window.content
+    box = toga.Box()
+    box.add(widget)
+    app.main_window.content = box
+    return content
+
+
+def restore_window(content: toga.Widget | None):
+    if content is not None:
+        toga.App.app.main_window.content = content
+
+
+def drawing_actions(chart: TimeSeriesChart) -> list:
+    if hasattr(chart, "root_state"):
+        return list(chart.root_state.drawing_actions)
+    return list(chart.context.drawing_objects)
+
+
+def test_chart_in_a_window_is_drawn():
+    chart = TimeSeriesChart(time_window=50.0)
+    content = show_in_window(chart)
+    try:
+        assert chart.window is not None
+        for index in range(100):
+            chart.series.append(float(index), float(index % 7))
+        chart.redraw_chart()
+        assert drawing_actions(chart)
+    finally:
+        chart.close()
+        restore_window(content)
+
+
+async def test_append_schedules_one_redraw():
+    chart = TimeSeriesChart()
+    chart.append(1.0, timestamp=0.0)
+    handle = chart._redraw_handle
+    chart.append(2.0, timestamp=1.0)
+    assert chart._redraw_handle is handle
+    assert len(chart.series) == 2
+    chart.close()
+    assert chart._redraw_handle is None
+
+
+class FakeClient:
+    address = "F0:F1:F2:F3:F4:F5"
+
+    def __init__(self, presentation_format: bytes):
+        self.presentation_format = presentation_format
+
+    async def read_gatt_descriptor(self, handle: int) -> bytes:
+        await asyncio.sleep(0)
+        return self.presentation_format
+
+
+def make_characteristic(with_presentation_format: bool) -> BleakGATTCharacteristic:
+    characteristic = BleakGATTCharacteristic(
+        None, 3, normalize_uuid_16(0x2A6E), ["notify"], lambda: 23, None
+    )
+    if with_presentation_format:
+        characteristic.add_descriptor(
+            BleakGATTDescriptor(None, 5, PRESENTATION_FORMAT_UUID, characteristic)
+        )
+    return characteristic
+
+
+async def test_notifications_are_charted_with_the_presentation_format():
+    characteristic = make_characteristic(with_presentation_format=True)
+    # sint16 with exponent -2
+    cache = GattReadCache(FakeClient(b"\x0e\xfe\x2f\x27\x01\x00\x00"))
+    row = CharacteristicRow(cache, characteristic)
+    await row.read_presentation_format()
+    assert row.format_selection.value == "sint16"
+
+    row.on_notification(characteristic, bytearray(b"\x2e\xfb"))
+    assert row.value_chart.series.levels[0].minima[0] == -12.34
+    # Values of another size are not charted
+    row.on_notification(characteristic, bytearray(b"\x01"))
+    assert len(row.value_chart.series) == 1
+    row.close()
+
+
+async def test_notifications_are_only_charted_with_a_known_format():
+    characteristic = make_characteristic(with_presentation_format=False)
+    row = CharacteristicRow(GattReadCache(FakeClient(b"")), characteristic)
+    await row.read_presentation_format()
+    row.on_notification(characteristic, bytearray(b"\xff"))
+    assert row.value_chart is None
+
+    row.format_selection.value = "sint8"
+    assert row.value_format == NUMERIC_FORMATS["sint8"]
+    row.on_notification(characteristic, bytearray(b"\xff"))
+    assert row.value_chart.series.levels[0].minima[0] == -1
+    # A new format starts a new chart
+    row.format_selection.value = "uint8"
+    assert row.value_chart is None
+    row.close()
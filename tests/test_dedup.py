@@ -0,0 +1,51 @@
+from bleakbleexplorer.dedup import AdvertisementDeduplicator, UpdateKind, classify_batch
+
+from .scan_results import make_advertisement
+
+
+def test_repeated_advertisements_are_suppressed():
+    dedup = AdvertisementDeduplicator(rssi_threshold=3)
+    assert dedup.classify(*make_advertisement(rssi=-60)) is UpdateKind.NEW
+    assert dedup.classify(*make_advertisement(rssi=-61)) is UpdateKind.SUPPRESSED
+    assert dedup.classify(*make_advertisement(rssi=-63)) is UpdateKind.RSSI
+    # The threshold is relative to the last shown RSSI
+    assert dedup.classify(*make_advertisement(rssi=-61)) is UpdateKind.SUPPRESSED
+    assert (
+        dedup.classify(*make_advertisement(rssi=-63, manufacturer_data={1: b"\x01"}))
+        is UpdateKind.CONTENT
+    )
+    assert (dedup.stats.new, dedup.stats.content_updates) == (1, 1)
+    assert (dedup.stats.rssi_updates, dedup.stats.suppressed) == (1, 2)
+
+
+def test_batches_update_each_device_once():
+    dedup = AdvertisementDeduplicator()
+    updates = dedup.process_batch(
+        [
+            make_advertisement(rssi=-60),
+            make_advertisement(rssi=-70),
+            make_advertisement(rssi=-70),
+            make_advertisement(address="00:00:00:00:00:01"),
+        ]
+    )
+    assert [(adv_data.rssi, kind) for _, adv_data, kind in updates] == [
+        (-70, UpdateKind.NEW),
+        (-60, UpdateKind.NEW),
+    ]
+    assert dedup.stats.suppressed == 1
+
+
+def test_classify_batch_only_reads_the_snapshot():
+    dedup = AdvertisementDeduplicator()
+    dedup.classify(*make_advertisement(rssi=-60))
+    items = [make_advertisement(rssi=-70), make_advertisement(rssi=-71)]
+    snapshot = dedup.snapshot(items)
+    result = classify_batch(items, snapshot, dedup.rssi_threshold)
+    assert snapshot == dedup.last_shown
+    assert dedup.stats.total == 1
+
+    [(_, adv_data, kind)] = dedup.merge(result)
+    assert (adv_data.rssi, kind) == (-70, UpdateKind.RSSI)
+    assert dedup.last_shown["F0:F1:F2:F3:F4:F5"][1] == -70
+    assert (dedup.stats.new, dedup.stats.rssi_updates) == (1, 1)
+    assert dedup.stats.suppressed == 1
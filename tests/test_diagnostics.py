@@ -0,0 +1,40 @@
+from bleakbleexplorer.ble_scan_box import BLEScanResultsListView
+from bleakbleexplorer.diagnostics import diagnostics, repeat_leak_check
+
+from .scan_results import make_scan_results
+
+try:
+    # The dummy backend (used for headless runs) logs every widget action and
+    # would keep all widgets alive.
+    from toga_dummy.utils import EventLog
+except ImportError:
+    EventLog = None
+
+
+async def test_repeated_scans_release_rows():
+    view = BLEScanResultsListView(horizontal=False)
+    results = make_scan_results(20)
+
+    def show_results():
+        if EventLog is not None:
+            EventLog.reset()
+        view.clear()
+        for device, adv_data in results:
+            view.append_device(device, adv_data, lambda device, adv_data: None)
+
+    report = await repeat_leak_check(show_results, repetitions=5)
+    report.assert_no_leaks(max_bytes_per_repetition=64 * 1024)
+    assert diagnostics.list_view_stats()[f"BLEScanResultsListView@{id(view):x}"][
+        "rows"
+    ] == len(results)
+
+
+def test_format_report():
+    view = BLEScanResultsListView(horizontal=False)
+    for device, adv_data in make_scan_results(3):
+        view.append_device(device, adv_data, lambda device, adv_data: None)
+
+    diagnostics.screen_shown("scan")
+    report = diagnostics.format_report()
+    assert "screen: scan" in report
+    assert f"  BLEScanResultsListView@{id(view):x}: {{'rows': 3" in report
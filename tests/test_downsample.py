@@ -0,0 +1,53 @@
+import numpy as np
+
+from bleakbleexplorer.downsample import MinMaxPyramid
+
+
+def test_envelope_is_bounded_and_keeps_extremes():
+    pyramid = MinMaxPyramid()
+    values = np.sin(np.arange(100_001) / 500.0)
+    values[12_345] = 5.0
+    for index, value in enumerate(values):
+        pyramid.append(float(index), float(value))
+
+    envelope = pyramid.envelope(max_buckets=300)
+    assert len(envelope) <= 300 + 3 * len(pyramid.levels)
+    assert envelope.maxima.max() == 5.0
+    assert envelope.minima.min() == values.min()
+    assert (np.diff(envelope.times) > 0).all()
+    # The newest samples are included, even if they are not combined yet
+    assert envelope.times[-1] == 100_000.0
+
+
+def test_envelope_of_time_range():
+    pyramid = MinMaxPyramid()
+    for index in range(10_000):
+        pyramid.append(float(index), float(index))
+
+    envelope = pyramid.envelope(max_buckets=100, start=9_000.0, end=9_500.0)
+    assert len(envelope) <= 100 + 3 * len(pyramid.levels)
+    assert envelope.minima.min() <= 9_000.0
+    assert envelope.maxima.max() >= 9_500.0
+    assert envelope.times[0] <= 9_000.0 and envelope.times[-1] <= 9_500.0
+
+
+def test_levels_are_capped():
+    pyramid = MinMaxPyramid(max_buckets=64)
+    values = np.cos(np.arange(10_001) / 50.0)
+    values[10] = -5.0
+    for index, value in enumerate(values):
+        pyramid.append(float(index), float(value))
+
+    assert len(pyramid) == 10_001
+    assert all(level.stored <= 64 for level in pyramid.levels)
+    assert pyramid.last_time == 10_000.0
+    # The dropped samples are still covered by the coarser levels
+    envelope = pyramid.envelope(max_buckets=300)
+    assert envelope.minima.min() == -5.0
+    assert envelope.maxima.max() == values.max()
+    assert (np.diff(envelope.times) > 0).all()
+    assert envelope.times[-1] == 10_000.0
+
+    envelope = pyramid.envelope(max_buckets=300, start=9_990.0)
+    assert envelope.times[0] <= 9_990.0
+    assert len(envelope) <= 300 + 3 * len(pyramid.levels)
@@ -0,0 +1,117 @@
+import csv
+import json
+
+import pytest
+
+from bleakbleexplorer.export import (
+    ADVERTISEMENT_COLUMNS,
+    NOTIFICATION_COLUMNS,
+    ExportManager,
+    StreamExporter,
+    advertisement_record,
+    read_columnar,
+)
+
+from .scan_results import make_advertisement
+
+
+def test_export_formats(tmp_path):
+    device, adv_data = make_advertisement(tx_power=None)
+    record = advertisement_record(device, adv_data, timestamp=1.5)
+    for format in ("csv", "jsonl", "columnar"):
+        exporter = StreamExporter(
+            tmp_path / format, "adv", ADVERTISEMENT_COLUMNS, format
+        )
+        exporter.write(record)
+        exporter.write(record)
+        exporter.close()
+        assert exporter.stats.records == 2
+        [path] = exporter.paths
+
+        if format == "csv":
+            with open(path, newline="") as file:
+                rows = list(csv.DictReader(file))
+            assert len(rows) == 2
+            assert rows[0]["manufacturer_data"] == "004C:0215616263"
+            assert rows[0]["tx_power"] == ""
+        elif format == "jsonl":
+            rows = [json.loads(line) for line in path.read_text().splitlines()]
+            assert len(rows) == 2
+            assert rows[0]["rssi"] == -60
+            assert rows[0]["tx_power"] is None
+        else:
+            with open(path, "rb") as file:
+                [block] = list(read_columnar(file))
+            assert block["timestamp"] == [1.5, 1.5]
+            assert block["address"] == [device.address] * 2
+            assert block["tx_power"] == [None, None]
+
+
+def test_files_are_rotated(tmp_path):
+    exporter = StreamExporter(
+        tmp_path,
+        "notifications",
+        NOTIFICATION_COLUMNS,
+        "columnar",
+        max_file_size=1000,
+        block_size=10,
+    )
+    for i in range(100):
+        exporter.write((float(i), "F0:F1:F2:F3:F4:F5", "2a19", 3, bytes(20)))
+        if i % 10 == 9:
+            exporter.flush()
+    exporter.close()
+
+    assert exporter.stats.records == 100
+    assert len(exporter.paths) > 1
+    timestamps = []
+    for path in exporter.paths:
+        with open(path, "rb") as file:
+            for block in read_columnar(file):
+                timestamps.extend(block["timestamp"])
+    assert timestamps == [float(i) for i in range(100)]
+
+
+def test_write_after_close(tmp_path):
+    exporter = StreamExporter(tmp_path, "notifications", NOTIFICATION_COLUMNS)
+    exporter.close()
+    with pytest.raises(ValueError):
+        exporter.write((0.0, "F0:F1:F2:F3:F4:F5", "2a19", 3, b""))
+    assert exporter.stats.records == 0
+
+
+async def test_stop_async(tmp_path):
+    manager = ExportManager()
+    manager.start(tmp_path, "csv")
+    manager.write_advertisement(*make_advertisement())
+    summary = await manager.stop_async()
+    assert summary.startswith("Advertisements: 1 records")
+    assert not manager.running
+    # Ignored after the stop
+    manager.write_advertisement(*make_advertisement())
+
+
+def test_exports_in_the_same_second_keep_their_files(tmp_path):
+    paths = []
+    for _ in range(2):
+        exporter = StreamExporter(tmp_path, "notifications", NOTIFICATION_COLUMNS)
+        exporter.write((0.0, "F0:F1:F2:F3:F4:F5", "2a19", 3, b"\x01"))
+        exporter.close()
+        paths.extend(exporter.paths)
+    assert len(set(paths)) == 2
+    assert all(len(path.read_text().splitlines()) == 1 for path in paths)
+
+
+def test_writer_errors_are_reported(tmp_path):
+    exporter = StreamExporter(
+        tmp_path, "notifications", NOTIFICATION_COLUMNS, "columnar"
+    )
+    # Not a number in the timestamp column
+    exporter.write(("now", "F0:F1:F2:F3:F4:F5", "2a19", 3, b"\x01"))
+    exporter.flush()
+    exporter.write((0.0, "F0:F1:F2:F3:F4:F5", "2a19", 3, b"\x01"))
+    exporter.close()
+    assert isinstance(exporter.error, TypeError)
+    assert exporter.stats.records == 0
+    assert exporter.stats.dropped == 1
+    assert "failed: TypeError" in str(exporter.stats)
@@ -0,0 +1,59 @@
+from bleak.backends.scanner import AdvertisementData
+
+from bleakbleexplorer.formatting import (
+    NUMERIC_FORMATS,
+    advertisement_content_key,
+    format_advertisement,
+    format_hex,
+    presentation_format,
+)
+
+
+def test_format_hex_is_bounded():
+    assert format_hex(b"\x01\xab") == "0x01AB"
+    assert format_hex(bytes(100), max_bytes=4) == "0x00000000... (100 bytes)"
+
+
+def test_content_key_ignores_rssi():
+    adv_data = AdvertisementData(
+        local_name="Bumble",
+        manufacturer_data={0x004C: b"\x01"},
+        service_data={},
+        service_uuids=[],
+        tx_power=-4,
+        rssi=-60,
+        platform_data=(),
+    )
+    assert advertisement_content_key(adv_data) == advertisement_content_key(
+        adv_data._replace(rssi=-70)
+    )
+    assert format_advertisement(adv_data) == (
+        "Local Name: Bumble\nManufacturer Data:\nCompany: 0x004C\n0x01\nTX-Power: -4\n"
+    )
+
+
+def test_numeric_formats():
+    assert NUMERIC_FORMATS["uint16"].decode(b"\xff\xff") == 0xFFFF
+    assert NUMERIC_FORMATS["sint16"].decode(b"\xff\xff") == -1
+    assert NUMERIC_FORMATS["float32"].decode(b"\x00\x00\xc0\x3f") == 1.5
+    # Only values of the right size are decoded
+    assert NUMERIC_FORMATS["uint16"].decode(b"\x01") is None
+
+    # sint16 with exponent -2, e.g. a temperature in 0.01 °C
+    name, value_format = presentation_format(b"\x0e\xfe\x2f\x27\x01\x00\x00")
+    assert name == "sint16"
+    assert value_format.decode((-1234).to_bytes(2, "little", signed=True)) == -12.34
+    # UTF-8 string
+    assert presentation_format(b"\x19\x00\x00\x27\x01\x00\x00") is None
+
+    assert presentation_format(b"\x09\x00")[0] == "uint48"
+    assert presentation_format(b"\x0a\x00")[0] == "uint64"
+    assert presentation_format(b"\x11\x00")[0] == "sint48"
+    name, value_format = presentation_format(b"\x12\x00")
+    assert name == "sint64"
+    assert value_format.decode((-(2**40)).to_bytes(8, "little", signed=True)) == -(
+        2**40
+    )
+    # uint128 and sint128
+    assert presentation_format(b"\x0b\x00") is None
+    assert presentation_format(b"\x13\x00") is None
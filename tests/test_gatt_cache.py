@@ -0,0 +1,135 @@
+import asyncio
+
+from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak.uuids import normalize_uuid_16
+
+from bleakbleexplorer.gatt_cache import GattReadCache
+
+
+class FakeClient:
+    def __init__(self):
+        self.reads = 0
+        self.notify_callbacks = {}
+
+    async def read_gatt_char(self, characteristic):
+        self.reads += 1
+        await asyncio.sleep(0)
+        return bytearray([self.reads])
+
+    async def start_notify(self, characteristic, callback):
+        self.notify_callbacks[characteristic.handle] = callback
+
+    async def stop_notify(self, characteristic):
+        del self.notify_callbacks[characteristic.handle]
+
+
+def make_characteristic(uuid: int, handle: int) -> BleakGATTCharacteristic:
+    return BleakGATTCharacteristic(
+        None, handle, normalize_uuid_16(uuid), ["read", "notify"], lambda: 23, None
+    )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_ttl_and_static_values():
+    client = FakeClient()
+    clock = FakeClock()
+    cache = GattReadCache(client, default_ttl=1.0, clock=clock)
+    manufacturer_name = make_characteristic(0x2A29, 1)
+    battery_level = make_characteristic(0x2A19, 3)
+
+    assert await cache.read(manufacturer_name) == bytearray([1])
+    assert await cache.read(battery_level) == bytearray([2])
+    clock.now = 0.5
+    assert await cache.read(battery_level) == bytearray([2])
+    clock.now = 10.0
+    assert await cache.read(manufacturer_name) == bytearray([1])
+    assert await cache.read(battery_level) == bytearray([3])
+    assert await cache.read(manufacturer_name, force_refresh=True) == bytearray([4])
+
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.refreshes) == (2, 3, 1)
+
+
+async def test_concurrent_reads_share_one_round_trip():
+    client = FakeClient()
+    cache = GattReadCache(client)
+    characteristic = make_characteristic(0x2A19, 3)
+    values = await asyncio.gather(*(cache.read(characteristic) for _ in range(5)))
+    assert values == [bytearray([1])] * 5
+    assert client.reads == 1
+
+
+async def test_notifications_update_the_cache():
+    client = FakeClient()
+    clock = FakeClock()
+    cache = GattReadCache(client, default_ttl=1.0, clock=clock)
+    characteristic = make_characteristic(0x2A19, 3)
+    received = []
+
+    await cache.start_notify(characteristic, lambda sender, data: received.append(data))
+    client.notify_callbacks[3](characteristic, bytearray(b"\x42"))
+    clock.now = 100.0
+    # Fresh as long as notifications are active
+    assert await cache.read(characteristic) == bytearray(b"\x42")
+    assert received == [bytearray(b"\x42")]
+
+    await cache.stop_notify(characteristic)
+    assert await cache.read(characteristic) == bytearray([1])
+    assert cache.stats.notifications == 1
+
+
+async def test_subscription_only_trusts_notifications():
+    client = FakeClient()
+    clock = FakeClock()
+    cache = GattReadCache(client, default_ttl=1.0, clock=clock)
+    characteristic = make_characteristic(0x2A19, 3)
+
+    assert await cache.read(characteristic) == b"\x01"
+    await cache.start_notify(characteristic, lambda sender, data: None)
+    # The value from before the subscription is not cached anymore
+    assert await cache.read(characteristic) == b"\x02"
+    clock.now = 100.0
+    # No notification yet, the read value expires with its TTL
+    assert await cache.read(characteristic) == b"\x03"
+    assert client.reads == 3
+
+
+async def test_reads_dont_overwrite_newer_notifications():
+    clock = FakeClock()
+
+    class SlowClient(FakeClient):
+        async def read_gatt_char(self, characteristic):
+            value = await super().read_gatt_char(characteristic)
+            # A notification arrives while the read is in flight
+            clock.now += 1.0
+            self.notify_callbacks[characteristic.handle](
+                characteristic, bytearray(b"\x42")
+            )
+            return value
+
+    client = SlowClient()
+    cache = GattReadCache(client, clock=clock)
+    characteristic = make_characteristic(0x2A19, 3)
+    await cache.start_notify(characteristic, lambda sender, data: None)
+
+    assert await cache.read(characteristic) == b"\x01"
+    assert await cache.read(characteristic) == b"\x42"
+    assert client.reads == 1
+
+
+async def test_cached_values_are_copies():
+    client = FakeClient()
+    cache = GattReadCache(client)
+    characteristic = make_characteristic(0x2A19, 3)
+    await cache.start_notify(characteristic, lambda sender, data: None)
+    data = bytearray(b"\x42")
+    client.notify_callbacks[3](characteristic, data)
+    data[0] = 0
+    assert await cache.read(characteristic) == b"\x42"
+    assert isinstance(await cache.read(characteristic), bytes)
@@ -0,0 +1,36 @@
+import threading
+
+from bleakbleexplorer.processing import (
+    OFFLOAD_BATCH_SIZE,
+    BatchProcessor,
+    processing_pool,
+)
+
+
+def thread_names(items: list[int]) -> list[str]:
+    return [threading.current_thread().name] * len(items)
+
+
+async def test_only_big_batches_are_offloaded():
+    small = await processing_pool.run_batch(thread_names, [0])
+    assert small == [threading.current_thread().name]
+    [big, *_] = await processing_pool.run_batch(
+        thread_names, list(range(OFFLOAD_BATCH_SIZE))
+    )
+    assert big.startswith("bleakbleexplorer-processing")
+
+
+async def test_batch_processor_processes_everything_on_close():
+    batches = []
+
+    async def double(items: list[int]) -> list[int]:
+        return [2 * item for item in items]
+
+    processor = BatchProcessor(double, batches.append, interval=10.0, max_batch=4)
+    for item in range(10):
+        processor.submit(item)
+    await processor.close()
+    assert [item for batch in batches for item in batch] == [
+        2 * item for item in range(10)
+    ]
+    assert all(len(batch) <= 4 for batch in batches)
@@ -0,0 +1,62 @@
+import json
+
+import toga
+from toga.style import Pack
+
+from bleakbleexplorer.ble_scan_box import BLEDeviceRow, BLEScanResultsListView, InfoRow
+from bleakbleexplorer.profiling import Profiler, _layout_name
+
+from .scan_results import make_scan_results
+
+
+def test_profiler_records_rows_and_tree_operations(tmp_path):
+    profiler = Profiler()
+    profiler.install()
+    try:
+        view = BLEScanResultsListView(horizontal=False)
+        for device, adv in make_scan_results(5):
+            view.append_device(device, adv, on_connect=None)
+        view.add_row(InfoRow("done"))
+    finally:
+        profiler.uninstall()
+
+    summary = profiler.summary()
+    assert summary["new BLEDeviceRow"]["count"] == 5
+    assert summary["new InfoRow"]["count"] == 1
+    assert any(name.endswith(".add") for name in summary)
+
+    # Nothing is recorded after uninstalling
+    events = len(profiler.events)
+    InfoRow("not recorded")
+    assert len(profiler.events) == events
+
+    path = tmp_path / "trace.json"
+    profiler.write_trace(path)
+    trace = json.loads(path.read_text())
+    assert len(trace["traceEvents"]) == events
+    assert all(event["ph"] == "X" for event in trace["traceEvents"])
+
+
+def test_profiler_records_layout():
+    # The running app on a device, a dummy app in headless runs
+    app = toga.App.app or toga.App("Bleak BLE Explorer", "org.example.profiling")
+    window = app.main_window
+    content = window.content
+    profiler = Profiler()
+    profiler.install()
+    try:
+        box = toga.Box()
+        window.content = box
+        device, adv = make_scan_results(1)[0]
+        box.add(BLEDeviceRow(device, adv, on_connect=None))
+        box.refresh()
+    finally:
+        profiler.uninstall()
+        if content is not None:
+            window.content = content
+
+    layout_events = [event for event in profiler.events if event["cat"] == "layout"]
+    assert layout_events
+    assert "layout Box" in {event["name"] for event in layout_events}
+    # Styles without a node are laid out without a span
+    assert _layout_name(Pack()) is None
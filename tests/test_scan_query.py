@@ -0,0 +1,42 @@
+from bleakbleexplorer.scan_query import ScanFilter
+
+from .scan_results import make_advertisement
+
+
+def test_empty_filter_matches_everything():
+    assert ScanFilter().matches(*make_advertisement())
+
+
+def test_filter_by_address_is_case_insensitive():
+    result = make_advertisement()
+    assert ScanFilter(address="f0:f1:f2:f3:f4:f5").matches(*result)
+    assert not ScanFilter(address="F0:F1:F2:F3:F4:F6").matches(*result)
+
+
+def test_filter_by_name():
+    result = make_advertisement(local_name="Bumble Battery")
+    assert ScanFilter(name="Bumble Battery").matches(*result)
+    assert ScanFilter(name="Bumble").matches(*result)  # device name
+    assert not ScanFilter(name="Other").matches(*result)
+
+
+def test_filter_by_service_uuid():
+    result = make_advertisement()
+    assert ScanFilter(service_uuid="180f").matches(*result)
+    assert not ScanFilter(service_uuid="180a").matches(*result)
+
+
+def test_filter_by_manufacturer_data():
+    result = make_advertisement()
+    assert ScanFilter(manufacturer_id=0x004C).matches(*result)
+    assert ScanFilter(manufacturer_data=b"\x02\x15").matches(*result)
+    assert ScanFilter(manufacturer_id=0x004C, manufacturer_data=b"\x02").matches(
+        *result
+    )
+    assert not ScanFilter(manufacturer_id=0x0059).matches(*result)
+    assert not ScanFilter(manufacturer_data=b"\x03").matches(*result)
+
+
+def test_filter_by_predicate():
+    result = make_advertisement(rssi=-80)
+    assert not ScanFilter(predicate=lambda d, a: a.rssi > -70).matches(*result)
@@ -0,0 +1,72 @@
+from bleakbleexplorer.scan_scheduler import CycleStats, ScanSchedule, ScanScheduler
+
+from .scan_results import make_advertisement
+
+
+def test_adaptive_backoff():
+    schedule = ScanSchedule(off_time=2.0, backoff_factor=2.0, max_off_time=5.0)
+    assert schedule.next_off_time(2.0, new_devices=0) == 4.0
+    assert schedule.next_off_time(4.0, new_devices=0) == 5.0
+    assert schedule.next_off_time(5.0, new_devices=1) == 2.0
+    assert ScanSchedule(adaptive=False).next_off_time(2.0, new_devices=0) == 2.0
+
+
+def test_new_devices_are_scanned_harder():
+    schedule = ScanSchedule(
+        scanning_mode="passive", on_time=3.0, max_on_time=10.0, backoff_factor=2.0
+    )
+    assert schedule.next_on_time(3.0, new_devices=1) == 6.0
+    assert schedule.next_on_time(6.0, new_devices=1) == 10.0
+    assert schedule.next_on_time(10.0, new_devices=0) == 3.0
+    assert schedule.next_scanning_mode(new_devices=1) == "active"
+    assert schedule.next_scanning_mode(new_devices=0) == "passive"
+
+    fixed = ScanSchedule(scanning_mode="passive", adaptive=False)
+    assert fixed.next_on_time(3.0, new_devices=1) == 3.0
+    assert fixed.next_scanning_mode(new_devices=1) == "passive"
+
+
+def test_duty_cycle_without_time():
+    stats = CycleStats(1, "active", 0.0, 0, 0, 0, off_time=0.0)
+    assert stats.duty_cycle == 0.0
+
+
+class FakeScanner:
+    """Reports the same two devices in every scan cycle."""
+
+    def __init__(self, detection_callback, scanning_mode):
+        self.detection_callback = detection_callback
+
+    async def __aenter__(self):
+        for address in ("00:00:00:00:00:01", "00:00:00:00:00:02"):
+            self.detection_callback(*make_advertisement(address=address))
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+async def test_scheduler_backs_off_while_devices_are_stable():
+    seen = []
+
+    def on_cycle(stats):
+        seen.append(stats)
+        if len(seen) == 3:
+            scheduler.stop()
+
+    scheduler = ScanScheduler(
+        ScanSchedule(
+            scanning_mode="passive", on_time=0.01, off_time=0.01, max_off_time=0.03
+        ),
+        detection_callback=lambda device, adv_data: None,
+        on_cycle=on_cycle,
+        scanner_factory=FakeScanner,
+    )
+    await scheduler.run()
+
+    assert [stats.new_devices for stats in seen] == [2, 0, 0]
+    assert [stats.off_time for stats in seen] == [0.01, 0.02, 0.03]
+    assert all(stats.advertisements == 2 for stats in seen)
+    # The cycle after the new devices scans actively, then passive again
+    assert [stats.scanning_mode for stats in seen] == ["passive", "active", "passive"]
+    assert len(scheduler.discovered) == 2